@@ -0,0 +1,165 @@
+import heapq
+
+from mesa.space import MultiGrid
+from mesa.time import BaseScheduler
+
+
+class WatchedMultiGrid(MultiGrid):
+    """
+    MultiGrid that reports every cell whose contents change to a callback.
+    """
+
+    def __init__(self, width, height, torus, on_change=None):
+        super().__init__(width, height, torus)
+        self.on_change = on_change
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        if self.on_change is not None:
+            self.on_change(pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        super().remove_agent(agent)
+        if self.on_change is not None:
+            self.on_change(pos)
+
+
+class ActiveSetActivation(BaseScheduler):
+    """
+    Same step order and results as SimultaneousActivation, but only steps agents that
+    can act this tick.
+
+    After its step an agent may go to sleep by returning, from sleep_watch(), the cells
+    and lights its next step depends on (None keeps it awake). It is woken when one of
+    those cells changes (through WatchedMultiGrid) or one of those lights changes
+    (through light_changed). When a sleeper is stepped again, catch_up(ticks) first
+    applies the counters of the identical idle steps it skipped.
+    """
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.order = {}  # agent -> position in the step order
+        self.next_order = 0
+        self.awake = set()  # Agents to step next tick
+        self.sleeping = {}  # agent -> (tick of its last step, sleep token)
+        self.catch_up_from = {}  # Woken agent -> tick of its last step
+        self.cell_watchers = {}  # pos -> {agent: token}
+        self.light_watchers = {}  # light -> {agent: token}
+        self.tokens = 0
+        self.current_heap = None  # Agents still to step during the current tick
+        self.cursor = -1
+
+    def add(self, agent):
+        super().add(agent)
+        self.order[agent] = self.next_order
+        self.next_order += 1
+        self.awake.add(agent)  # As in SimultaneousActivation, agents added mid-tick start next tick
+
+    def remove(self, agent):
+        super().remove(agent)
+        self.order.pop(agent, None)
+        self.awake.discard(agent)
+        self.sleeping.pop(agent, None)
+        self.catch_up_from.pop(agent, None)
+
+    def sleep(self, agent, tick, cells, lights):
+        self.tokens += 1
+        token = self.tokens
+        self.sleeping[agent] = (tick, token)
+        for pos in cells:
+            self.cell_watchers.setdefault(pos, {})[agent] = token
+        for light in lights:
+            self.light_watchers.setdefault(light, {})[agent] = token
+
+    def wake(self, agent):
+        last_step, _ = self.sleeping.pop(agent)
+        self.catch_up_from[agent] = last_step
+        order = self.order[agent]
+        if self.current_heap is not None and order > self.cursor:
+            # Its turn in this tick has not come yet, so it sees the change this tick
+            heapq.heappush(self.current_heap, (order, agent))
+        else:
+            self.awake.add(agent)
+
+    def wake_watchers(self, watchers):
+        for agent, token in watchers.items():
+            entry = self.sleeping.get(agent)
+            if entry is not None and entry[1] == token:
+                self.wake(agent)
+
+    def cell_changed(self, pos):
+        watchers = self.cell_watchers.pop(pos, None)
+        if watchers:
+            self.wake_watchers(watchers)
+
+    def light_changed(self, light):
+        watchers = self.light_watchers.pop(light, None)
+        if watchers:
+            self.wake_watchers(watchers)
+
+    def step(self):
+        tick = self.steps
+        heap = [(self.order[agent], agent) for agent in self.awake]
+        heapq.heapify(heap)
+        self.awake = set()
+        self.current_heap = heap
+
+        stepped = []
+        while heap:
+            order, agent = heapq.heappop(heap)
+            if agent not in self.order:
+                continue  # Removed during this tick
+            self.cursor = order
+
+            last_step = self.catch_up_from.pop(agent, None)
+            if last_step is not None and tick - last_step > 1:
+                agent.catch_up(tick - last_step - 1)
+
+            agent.step()
+            if agent not in self.order:
+                continue  # Removed itself, e.g. a car leaving the map
+            stepped.append(agent)
+
+            sleep_watch = getattr(agent, "sleep_watch", None)
+            watch = sleep_watch() if sleep_watch is not None else None
+            if watch is None:
+                self.awake.add(agent)
+            else:
+                self.sleep(agent, tick, *watch)
+
+        self.current_heap = None
+        self.cursor = -1
+        for agent in stepped:
+            agent.advance()
+        self.steps += 1
+        self.time += 1
+
+    def sync(self):
+        """
+        Bring the counters of sleeping agents up to date, e.g. before reading them.
+        """
+        last_tick = self.steps - 1
+        for agent, (last_step, token) in self.sleeping.items():
+            if last_tick > last_step:
+                agent.catch_up(last_tick - last_step)
+                self.sleeping[agent] = (last_tick, token)
+        for agent, last_step in self.catch_up_from.items():
+            if last_tick > last_step:
+                agent.catch_up(last_tick - last_step)
+                self.catch_up_from[agent] = last_tick
+
+    def pending_ticks(self, agent):
+        """
+        Number of skipped idle steps of an agent that catch_up has not applied yet,
+        without applying them.
+        """
+        entry = self.sleeping.get(agent)
+        last_step = entry[0] if entry is not None else self.catch_up_from.get(agent)
+        if last_step is None:
+            return 0
+        return max(0, self.steps - 1 - last_step)
+
+    @property
+    def active_count(self):
+        return len(self.order) - len(self.sleeping)
@@ -1,7 +1,9 @@
 from mesa import Agent
 import random
 from mesa.space import MultiGrid
-from map import endList
+from map import endList, semaphorePositions, turnPoints
+from decisions import (AGENT_TYPE_CODES, LIGHT_STATE_CODES, NEGOTIATION_TABLE, REWARD_MATRIX,
+                       RESPECT_LIGHT_PROBABILITY, SKIP_STOP_SIGN_PROBABILITY, TURN_PROBABILITY)
 
 
 class BuildingAgent(Agent):
@@ -12,17 +14,19 @@ class BuildingAgent(Agent):
     def step(self):
         pass
 
+    def sleep_watch(self):
+        # Buildings never change, they can sleep forever
+        return (), ()
+
+    def catch_up(self, ticks):
+        pass
+
 class TrafficLightAgent(Agent):
     def __init__(self, unique_id, model, pos, state):
         super().__init__(unique_id, model)
         self.pos = pos
         self.state = state  # Initial state: "red", "green", or "yellow"
-        
-
-        self.timer = 5 if state == "green" else 7  # Set initial timer based on initial state
-
-    def step(self):
-        pass  
+        # Phase changes are scheduled by the model on its light_wheel, lights are never stepped
 
 class PersonAgent(Agent):
     def __init__(self, unique_id, model, start_pos):
@@ -38,12 +42,11 @@ class PersonAgent(Agent):
         """
         closest_light = None
         min_distance = float("inf")
-        for agent in self.model.schedule.agents:
-            if isinstance(agent, TrafficLightAgent):
-                distance = abs(self.pos[0] - agent.pos[0]) + abs(self.pos[1] - agent.pos[1])
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_light = agent
+        for agent in self.model.traffic_lights:
+            distance = abs(self.pos[0] - agent.pos[0]) + abs(self.pos[1] - agent.pos[1])
+            if distance < min_distance:
+                min_distance = distance
+                closest_light = agent
         return closest_light
 
     def get_next_step(self, target):
@@ -91,6 +94,7 @@ class PersonAgent(Agent):
 
         # Get the closest traffic light
         closest_light = self.get_closest_traffic_light()
+        self.closest_light = closest_light
 
         # Check if the traffic light is red
         if closest_light and closest_light.state == "red":
@@ -99,6 +103,7 @@ class PersonAgent(Agent):
 
             # Calculate the next step towards the target position
             next_pos = self.get_next_step(target_pos)
+            self.next_cell = next_pos
 
             # Move to the calculated next position if possible
             if next_pos != self.pos and self.can_move_to(next_pos):
@@ -110,7 +115,34 @@ class PersonAgent(Agent):
                 # Update to the next target position
                 self.target_index = (self.target_index + 1) % len(self.target_positions)
 
+    def stop_movement(self):
+        """
+        Called by a wreckless driver entering the pedestrian's cell.
+        """
+        self.is_blocked = True
+
+    def sleep_watch(self):
+        """
+        Cells and lights whose change could make the pedestrian act again, or None if
+        it moved and has to be stepped next tick (used by ActiveSetActivation).
+        """
+        if self.pos != self.previous_pos or self.target_index != self.previous_target:
+            return None
+        cells = [self.pos]
+        if self.next_cell is not None:
+            cells.append(self.next_cell)
+        lights = (self.closest_light,) if self.closest_light is not None else ()
+        return cells, lights
+
+    def catch_up(self, ticks):
+        pass
+
     def step(self):
+        self.previous_pos = self.pos
+        self.previous_target = self.target_index
+        self.closest_light = None
+        self.next_cell = None
+
         # Check if a wreckless driver is in the same cell
         cell_contents = self.model.grid.get_cell_list_contents([self.pos])
         self.is_blocked = any(isinstance(agent, WrecklessAgent) for agent in cell_contents)
@@ -121,11 +153,15 @@ class WrecklessAgent(Agent):
         super().__init__(unique_id, model)
         self.starting_pos = starting_pos
         self.agent_type = agent_type
+        self.type_code = AGENT_TYPE_CODES[agent_type]
         self.state = "wreckless"
         self.happiness = 100
         self.jammedCounter = 0
         self.last_passed_lights = set()  # Initialize the attribute to track passed streetlights
+        self.start_trip()
+        self.set_initial_direction()
 
+    def set_initial_direction(self):
         # Initialize the current direction based on starting position
         if self.starting_pos[1] == 0:  # Moving up
             self.current_direction = "up"
@@ -135,12 +171,24 @@ class WrecklessAgent(Agent):
             self.current_direction = "right"
         elif self.starting_pos[0] == self.model.grid.width - 1:  # Moving left
             self.current_direction = "left"
+
+    def respawn(self, starting_pos):
+        """
+        Reset a finished agent so it can enter again at another lane (used by the demand pool).
+        """
+        self.starting_pos = starting_pos
+        self.happiness = 100
+        self.jammedCounter = 0
+        self.last_passed_lights = set()
+        self.start_trip()
+        self.set_initial_direction()
+
     def skip_stop_sign(self, semaphore):
         """
         Determines whether the agent should skip the stop sign or stop based on a 60% skip (True) or 40% stop (False).
         """
         # 60% chance to skip (True), 40% chance to stop (False)
-        return random.random() < 0.6  # True if skip, False if stop
+        return random.random() < SKIP_STOP_SIGN_PROBABILITY  # True if skip, False if stop
 
 
     def check_semaphore(self):
@@ -148,22 +196,7 @@ class WrecklessAgent(Agent):
         Determines if the wreckless agent is at a traffic light and decides whether to stop.
         Returns the semaphore if the agent decides to respect it (50% chance for red/yellow), otherwise None.
         """
-        semaphore_positions = {
-            (8, 22): (9, 15),
-            (9, 22): (9, 15),
-            (10, 22): (9, 15),
-            (22, 12): (15, 13),
-            (22, 13): (15, 13),
-            (22, 14): (15, 13),
-            (12, 0): (13, 7),
-            (13, 0): (13, 7),
-            (14, 0): (13, 7),
-            (0, 8): (7, 9),
-            (0, 9): (7, 9),
-            (0, 10): (7, 9),
-        }
-
-        controlling_position = semaphore_positions.get(self.starting_pos)
+        controlling_position = semaphorePositions.get(self.starting_pos)
         if not controlling_position:
             return None
 
@@ -172,15 +205,11 @@ class WrecklessAgent(Agent):
             if isinstance(agent, TrafficLightAgent):
                 semaphore = agent
 
-                # If the semaphore is red or yellow, decide whether to stop
-                if semaphore.state in ("red", "yellow"):
-                    if random.random() < 0.5:  # 50% chance to respect the semaphore
-                        return semaphore  # Respect the semaphore
-                    else:
-                        return None  # Skip the semaphore
-
-                # If the semaphore is green, allow the agent to proceed
-                return None
+                # Chance to respect the semaphore depends only on its state (0 when green)
+                respect_probability = RESPECT_LIGHT_PROBABILITY[LIGHT_STATE_CODES[semaphore.state]]
+                if respect_probability and random.random() < respect_probability:
+                    return semaphore  # Respect the semaphore
+                return None  # Skip the semaphore or proceed on green
 
         return None
 
@@ -205,6 +234,11 @@ class WrecklessAgent(Agent):
         elif self.current_direction == "left":
             preferred_move = (self.pos[0] - 1, self.pos[1])
 
+        # With a demand profile an agent driving off the edge leaves the map
+        if preferred_move and self.model.demand is not None and self.model.grid.out_of_bounds(preferred_move):
+            self.model.complete_trip(self)
+            return
+
         # Check if preferred_move is within bounds
         if preferred_move and not self.model.grid.out_of_bounds(preferred_move):
             # Check cell contents at preferred position
@@ -219,6 +253,7 @@ class WrecklessAgent(Agent):
                 # If there's a streetlight and the agent decides to respect it
                 if semaphore and semaphore.pos not in self.last_passed_lights:
                     # Stop if the agent respects the semaphore
+                    self.red_wait += 1
                     self.jammedCounter += 1
                     self.happiness -= 5
                     return
@@ -236,6 +271,7 @@ class WrecklessAgent(Agent):
                 return
 
             # If blocked by another vehicle, increment jammed counter
+            self.blocked_ticks += 1
             self.jammedCounter += 1
             self.happiness -= 2
         else:
@@ -249,25 +285,33 @@ class WrecklessAgent(Agent):
         Decide if the agent should change direction based on its current position.
         Returns the new direction if a turn is made, or None if no turn occurs.
         """
-        # Define turning points and probabilities
-        turn_points = {
-            (9, 11): "right", (10, 11): "right", (11, 11): "right",  # Down to right
-            (13, 14): "left", (14, 14): "left", (15, 14): "left",  # Up to left
-            (13, 10): "up", (13, 9): "up", (15, 11): "up",  # Right to up
-            (10, 13): "right", (10, 14): "right", (15, 14): "right",  # Left to right
-        }
-
-        if self.pos in turn_points:
-            new_direction = turn_points[self.pos]
-            if random.random() < 0.7:  # 70% chance to change direction
+        new_direction = turnPoints.get(self.pos)
+        if new_direction is not None:
+            if random.random() < TURN_PROBABILITY:  # 70% chance to change direction
                 self.current_direction = new_direction
                 return new_direction
 
         # No change in direction
         return None
+
+    def start_trip(self):
+        """
+        Reset the per-trip counters used by the model's trip statistics.
+        """
+        self.trip_start = self.model.current_time
+        self.red_wait = 0
+        self.blocked_ticks = 0
+        self.negotiations = 0
+
     def step(self):
+        previous_pos = self.pos
         self.move()
 
+        # A trip ends when the agent drives into one of the exit cells
+        if self.pos != previous_pos and self.pos in endList:
+            self.model.complete_trip(self)
+            self.start_trip()
+
 class CarAgent(Agent):
     def __init__(self, unique_id, model, starting_pos, agent_type=None):
         super().__init__(unique_id, model)
@@ -276,22 +320,22 @@ class CarAgent(Agent):
         self.state = "happy"
         self.happiness = 1000
         self.passed_light_timer = None
+        self.idle = None  # Why the car did not move in its last step, set by move()
+        self.light_seen = None
+        self.front_cell = None
         
         self.jammedCounter = 0
+        self.start_trip()
         
         # Asignar un tipo aleatorio si no se proporciona
         if agent_type is None:
             self.agent_type = random.choice(["cooperative", "competitive", "neutral"])  # Aleatorio
         else:
             self.agent_type = agent_type
+        self.type_code = AGENT_TYPE_CODES[self.agent_type]
         
         self.last_negotiation = None
-        self.reward_matrix = {
-            ("Rendir", "Rendir"): (3, 3),
-            ("Rendir", "Avanza"): (2, 4),
-            ("Avanza", "Rendir"): (5, 1),
-            ("Avanza", "Avanza"): (1, 1)
-        }
+        self.reward_matrix = REWARD_MATRIX  # Shared by all cars
 
     def is_rightmost_lane(self):
         """
@@ -309,29 +353,40 @@ class CarAgent(Agent):
             return y == 0
         return False
 
+    def start_trip(self):
+        """
+        Reset the per-trip counters used by the model's trip statistics.
+        """
+        self.trip_start = self.model.current_time
+        self.red_wait = 0
+        self.blocked_ticks = 0
+        self.negotiations = 0
+
+    def respawn(self, starting_pos, agent_type):
+        """
+        Reset a finished car so it can enter again at another lane (used by the demand pool).
+        """
+        self.starting_pos = starting_pos
+        self.agent_type = agent_type
+        self.type_code = AGENT_TYPE_CODES[agent_type]
+        self.last_passed_light = None
+        self.passed_light_timer = None
+        self.last_negotiation = None
+        self.idle = None
+        self.light_seen = None
+        self.state = "happy"
+        self.happiness = 1000
+        self.jammedCounter = 0
+        self.start_trip()
+
     def negotiate(self, other_agent):
-        # Determine the negotiation outcome based on agent types
-        if self.agent_type == "competitive" and other_agent.agent_type == "competitive":
-            my_action, other_action = "Avanza", "Avanza"
-        elif self.agent_type == "cooperative":
-            my_action, other_action = "Rendir", "Avanza"
-        elif other_agent.agent_type == "cooperative":
-            my_action, other_action = "Avanza", "Rendir"
-        else:
-            my_action, other_action = "Rendir", "Rendir"
+        self.negotiations += 1
+
+        # Outcome only depends on both agent types, so it is looked up in a precomputed table
+        my_action, my_reward, self.last_negotiation, becomes_angry = NEGOTIATION_TABLE[self.type_code][other_agent.type_code]
+        if becomes_angry:
             self.state = "angry"
-        
-        # Determine rewards (for potential future use)
-        my_reward, other_reward = self.reward_matrix[(my_action, other_action)]
-
-        # Set the last_negotiation attribute based on the outcome
-        if my_action == "Rendir" and other_action == "Rendir":
-            self.last_negotiation = "Rendir"
-        elif my_action == "Avanza" and other_action == "Avanza":
-            self.last_negotiation = "Stalemate"
-        else:
-            self.last_negotiation = "Avanza" if my_action == "Avanza" else "Rendir"
-        
+
         return my_action, my_reward
 
 
@@ -353,22 +408,7 @@ class CarAgent(Agent):
         Determina si el coche está en una intersección controlada por un semáforo.
         Actualiza last_passed_light y passed_light_timer si pasa el semáforo.
         """
-        semaphore_positions = {
-            (8, 22): (9, 15),
-            (9, 22): (9, 15),
-            (10, 22): (9, 15),
-            (22, 12): (15, 13),
-            (22, 13): (15, 13),
-            (22, 14): (15, 13),
-            (12, 0): (13, 7),
-            (13, 0): (13, 7),
-            (14, 0): (13, 7),
-            (0, 8): (7, 9),
-            (0, 9): (7, 9),
-            (0, 10): (7, 9),
-        }
-
-        controlling_position = semaphore_positions.get(self.starting_pos)
+        controlling_position = semaphorePositions.get(self.starting_pos)
         if not controlling_position or self.last_passed_light == controlling_position:
             return None  # Ignorar si ya pasó este semáforo
 
@@ -400,6 +440,9 @@ class CarAgent(Agent):
         - Negotiating with other cars.
         - Resetting `last_passed_light` after 2 steps.
         """
+        self.idle = None  # Why the car did not move this tick, if it did not
+        self.front_cell = None  # Cell it tried to move into, if any
+
         # Check if `last_passed_light` should be removed
         if self.last_passed_light is not None and self.passed_light_timer is not None:
             if self.passed_light_timer >= 2:
@@ -433,6 +476,7 @@ class CarAgent(Agent):
 
         # Check traffic light rules
         semaphore = self.check_semaphore()
+        self.light_seen = semaphore
         if semaphore:
             # Update `last_passed_light` if the car has passed the semaphore
             if self.starting_pos[1] == 0 and self.pos[1] > semaphore.pos[1]:  # Moving up
@@ -450,13 +494,20 @@ class CarAgent(Agent):
 
             # Stop if the light is red and hasn't been passed
             if semaphore.state == "red":
+                self.red_wait += 1
                 self.jammedCounter += 1
                 self.happiness -= 5
+                self.idle = "red"
                 return
 
         # Attempt to move
         if preferred_move:
+            if self.model.demand is not None and self.model.grid.out_of_bounds(preferred_move):
+                # With a demand profile the car leaves the map instead of wrapping around
+                self.model.complete_trip(self)
+                return
             x, y = self.model.grid.torus_adj(preferred_move)
+            self.front_cell = (x, y)
             cell_contents = self.model.grid.get_cell_list_contents([(x, y)])
             other_car = next((agent for agent in cell_contents if isinstance(agent, CarAgent)), None)
 
@@ -471,6 +522,7 @@ class CarAgent(Agent):
 
             # Negotiate with another car if present
             if other_car:
+                self.blocked_ticks += 1
                 my_action, my_reward = self.negotiate(other_car)
                 print(f"Car {self.unique_id} negotiated with Car {other_car.unique_id}: {my_action}")
 
@@ -483,6 +535,7 @@ class CarAgent(Agent):
                     # Yield or blocked
                     self.happiness += 1 if my_action == "Yield" else -2
                     self.jammedCounter += 1
+                    self.idle = "blocked"
                 return
 
         # Increase jammed counter if unable to move
@@ -491,7 +544,46 @@ class CarAgent(Agent):
         self.state = "angry" 
         if self.jammedCounter > 5:
             self.state = "angry"
+        self.idle = "stuck"
+
+    def idle_counters(self):
+        return (self.jammedCounter, self.happiness, self.red_wait, self.blocked_ticks, self.negotiations)
+
+    def sleep_watch(self):
+        """
+        Cells and lights whose change could let the car act differently, or None if it
+        has to be stepped next tick (used by ActiveSetActivation).
+        A car waiting at a red light only depends on the light; a blocked car also
+        depends on the cell in front of it. A car with no cell to move into stays awake.
+        """
+        if self.idle is None or self.last_passed_light is not None:
+            return None
+        lights = (self.light_seen,) if self.light_seen is not None else ()
+        if self.idle == "red":
+            return (), lights
+        if self.front_cell is None:
+            return None
+        return (self.front_cell,), lights
 
+    def catch_up(self, ticks):
+        """
+        Apply the counters of `ticks` skipped idle steps, each one identical to the last step.
+        """
+        jammed, happiness, red_wait, blocked, negotiations = self.idle_deltas
+        self.jammedCounter += jammed * ticks
+        self.happiness += happiness * ticks
+        self.red_wait += red_wait * ticks
+        self.blocked_ticks += blocked * ticks
+        self.negotiations += negotiations * ticks
 
     def step(self):
-        self.move()
\ No newline at end of file
+        previous_pos = self.pos
+        previous_counters = self.idle_counters()
+        self.move()
+        if self.idle is not None:
+            self.idle_deltas = tuple(after - before for after, before in zip(self.idle_counters(), previous_counters))
+
+        # A trip ends when the car drives into one of the exit cells
+        if self.pos != previous_pos and self.pos in endList:
+            self.model.complete_trip(self)
+            self.start_trip()
\ No newline at end of file
@@ -0,0 +1,116 @@
+class Histogram:
+    """
+    Fixed-bin histogram for non-negative tick counts.
+    Memory is constant no matter how many values are added; values past the last
+    bin are kept in an overflow bin.
+    """
+
+    def __init__(self, bin_width=1, num_bins=256):
+        self.bin_width = bin_width
+        self.num_bins = num_bins
+        self.counts = [0] * (num_bins + 1)  # Last bin is the overflow bin
+        self.count = 0
+        self.total = 0
+        self.max_value = 0
+
+    def add(self, value):
+        index = min(int(value // self.bin_width), self.num_bins)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max_value:
+            self.max_value = value
+
+    def merge(self, other):
+        """
+        Add the counts of another histogram with the same bins.
+        """
+        if (other.bin_width, other.num_bins) != (self.bin_width, self.num_bins):
+            raise ValueError("Histograms must have the same bins to be merged")
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Return the largest tick count of the bin holding the q-th quantile (0 <= q <= 1).
+        Values in the overflow bin are reported as the largest value seen.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if c and cumulative >= target:
+                if i == self.num_bins:
+                    return self.max_value
+                return min((i + 1) * self.bin_width - 1, self.max_value)
+        return self.max_value
+
+
+class TripStats:
+    """
+    Aggregates completed car trips per (origin, destination) pair.
+    Each pair keeps one histogram per metric, so million-trip runs use constant memory.
+    """
+
+    metrics = ("travel_time", "delay", "red_wait", "blocked", "negotiations")
+
+    def __init__(self, bin_width=1, num_bins=256):
+        self.bin_width = bin_width
+        self.num_bins = num_bins
+        self.pairs = {}
+        self.completed = 0
+
+    def record(self, origin, destination, travel_time, red_wait, blocked, negotiations):
+        key = (origin, destination)
+        histograms = self.pairs.get(key)
+        if histograms is None:
+            histograms = {metric: Histogram(self.bin_width, self.num_bins) for metric in self.metrics}
+            self.pairs[key] = histograms
+
+        histograms["travel_time"].add(travel_time)
+        histograms["delay"].add(red_wait + blocked)  # Ticks lost waiting, the rest is driving
+        histograms["red_wait"].add(red_wait)
+        histograms["blocked"].add(blocked)
+        histograms["negotiations"].add(negotiations)
+        self.completed += 1
+
+    def combined(self, metric):
+        """
+        Histogram of a metric over all origin/destination pairs.
+        """
+        result = Histogram(self.bin_width, self.num_bins)
+        for histograms in self.pairs.values():
+            result.merge(histograms[metric])
+        return result
+
+    def quantiles(self, metric, qs=(0.5, 0.95, 0.99), origin=None, destination=None):
+        """
+        Return {q: value} for a metric, for one pair or for all trips when no pair is given.
+        """
+        if origin is None and destination is None:
+            histogram = self.combined(metric)
+        else:
+            histograms = self.pairs.get((origin, destination))
+            if histograms is None:
+                return {q: None for q in qs}
+            histogram = histograms[metric]
+        return {q: histogram.quantile(q) for q in qs}
+
+    def summary(self, qs=(0.5, 0.95, 0.99)):
+        """
+        Per pair trip count and quantiles of every metric.
+        """
+        result = {}
+        for key, histograms in self.pairs.items():
+            result[key] = {"trips": histograms["travel_time"].count}
+            for metric in self.metrics:
+                result[key][metric] = {q: histograms[metric].quantile(q) for q in qs}
+        return result
@@ -0,0 +1,116 @@
+import json
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from mesa.datacollection import DataCollector
+
+
+class RollingDataCollector(DataCollector):
+    """
+    DataCollector for long runs with bounded memory.
+
+    model_vars keeps only the last `window` values of every reporter (enough for the
+    charts and the metrics exporter, which read the latest value). If `directory` is
+    given, every value is also buffered and written there in chunks of `chunk_size`
+    ticks as NumPy segments (full resolution), plus every `downsample`-th tick in
+    downsampled.csv for a quick overview. history() reads the full run back from disk.
+    """
+
+    def __init__(self, model_reporters=None, window=1000, directory=None, chunk_size=10000, downsample=100):
+        self.window = window
+        super().__init__(model_reporters)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.downsample = downsample
+        self.collected = 0  # Ticks collected so far
+        self.chunk = []
+        self.chunk_start = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            # Files of a previous run in the same directory would mix with this one
+            for name in os.listdir(directory):
+                if (name.startswith("segment_") and name.endswith(".npy")) or name == "downsampled.csv":
+                    os.remove(os.path.join(directory, name))
+            with open(os.path.join(directory, "columns.json"), "w") as f:
+                json.dump(list(self.model_reporters), f)
+
+    def _new_model_reporter(self, name, reporter):
+        super()._new_model_reporter(name, reporter)
+        self.model_vars[name] = deque(maxlen=self.window)
+
+    def collect(self, model):
+        super().collect(model)
+        if self.directory is not None:
+            self.chunk.append([self.model_vars[name][-1] for name in self.model_reporters])
+            if len(self.chunk) >= self.chunk_size:
+                self.spill()
+        self.collected += 1
+
+    def spill(self):
+        """
+        Write the buffered ticks to disk and clear the buffer.
+        """
+        if not self.chunk:
+            return
+        values = np.array(self.chunk, dtype=float)
+        np.save(os.path.join(self.directory, f"segment_{self.chunk_start:012d}.npy"), values)
+
+        path = os.path.join(self.directory, "downsampled.csv")
+        is_new = not os.path.exists(path)
+        with open(path, "a") as f:
+            if is_new:
+                f.write(",".join(["tick"] + list(self.model_reporters)) + "\n")
+            first = (-self.chunk_start) % self.downsample
+            for offset in range(first, len(self.chunk), self.downsample):
+                row = [str(self.chunk_start + offset)] + [repr(float(v)) for v in values[offset]]
+                f.write(",".join(row) + "\n")
+
+        self.chunk_start += len(self.chunk)
+        self.chunk = []
+
+    def flush(self):
+        if self.directory is not None:
+            self.spill()
+
+    def get_model_vars_dataframe(self):
+        """
+        The values still in memory, indexed by tick.
+        """
+        start = self.collected - len(next(iter(self.model_vars.values()), ()))
+        return pd.DataFrame({name: list(values) for name, values in self.model_vars.items()},
+                            index=range(start, self.collected))
+
+    def history(self, start=0, stop=None):
+        """
+        Full-resolution values for ticks [start, stop) as a DataFrame, read from the
+        segments on disk plus the ticks not spilled yet.
+        """
+        if self.directory is None:
+            raise ValueError("history() needs a directory to spill to")
+        stop = self.collected if stop is None else min(stop, self.collected)
+        columns = list(self.model_reporters)
+        parts = []
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("segment_") and name.endswith(".npy")):
+                continue
+            first = int(name[len("segment_"):-len(".npy")])
+            if first >= stop:
+                continue
+            values = np.load(os.path.join(self.directory, name))
+            if first + len(values) <= start:
+                continue
+            parts.append((first, values))
+        if self.chunk:
+            parts.append((self.chunk_start, np.array(self.chunk, dtype=float)))
+
+        frames = []
+        for first, values in parts:
+            lo = max(start, first) - first
+            hi = min(stop, first + len(values)) - first
+            if hi > lo:
+                frames.append(pd.DataFrame(values[lo:hi], columns=columns, index=range(first + lo, first + hi)))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames)
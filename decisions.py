@@ -0,0 +1,103 @@
+# Precomputed decision tables for car negotiation and wreckless driving.
+# Types and light states are encoded as small integers so the same tables can be
+# used by the agents one conflict at a time or by a batch engine for many at once.
+
+import numpy as np
+
+AGENT_TYPES = ("cooperative", "competitive", "neutral", "wreckless")
+AGENT_TYPE_CODES = {agent_type: code for code, agent_type in enumerate(AGENT_TYPES)}
+
+LIGHT_STATES = ("green", "yellow", "red")
+LIGHT_STATE_CODES = {state: code for code, state in enumerate(LIGHT_STATES)}
+
+REWARD_MATRIX = {
+    ("Rendir", "Rendir"): (3, 3),
+    ("Rendir", "Avanza"): (2, 4),
+    ("Avanza", "Rendir"): (5, 1),
+    ("Avanza", "Avanza"): (1, 1)
+}
+
+# Chance that a wreckless agent respects a light, indexed by light state code
+RESPECT_LIGHT_PROBABILITY = (0.0, 0.5, 0.5)
+SKIP_STOP_SIGN_PROBABILITY = 0.6
+TURN_PROBABILITY = 0.7
+
+
+def negotiation_outcome(my_type, other_type):
+    """
+    Reference negotiation rules between two car types.
+    Returns (my_action, my_reward, last_negotiation, becomes_angry).
+    """
+    becomes_angry = False
+    if my_type == "competitive" and other_type == "competitive":
+        my_action, other_action = "Avanza", "Avanza"
+    elif my_type == "cooperative":
+        my_action, other_action = "Rendir", "Avanza"
+    elif other_type == "cooperative":
+        my_action, other_action = "Avanza", "Rendir"
+    else:
+        my_action, other_action = "Rendir", "Rendir"
+        becomes_angry = True
+
+    my_reward, other_reward = REWARD_MATRIX[(my_action, other_action)]
+
+    if my_action == "Rendir" and other_action == "Rendir":
+        last_negotiation = "Rendir"
+    elif my_action == "Avanza" and other_action == "Avanza":
+        last_negotiation = "Stalemate"
+    else:
+        last_negotiation = "Avanza" if my_action == "Avanza" else "Rendir"
+
+    return my_action, my_reward, last_negotiation, becomes_angry
+
+
+# NEGOTIATION_TABLE[my_code][other_code] -> negotiation_outcome(...)
+NEGOTIATION_TABLE = tuple(
+    tuple(negotiation_outcome(my_type, other_type) for other_type in AGENT_TYPES)
+    for my_type in AGENT_TYPES
+)
+
+
+# The same table as NumPy arrays indexed [my_code, other_code], for bulk lookups
+NEGOTIATION_ACTIONS = ("Rendir", "Avanza")
+NEGOTIATION_RESULTS = ("Rendir", "Avanza", "Stalemate")
+NEGOTIATION_ACTION = np.array([[NEGOTIATION_ACTIONS.index(outcome[0]) for outcome in row] for row in NEGOTIATION_TABLE],
+                              dtype=np.int8)
+NEGOTIATION_REWARD = np.array([[outcome[1] for outcome in row] for row in NEGOTIATION_TABLE], dtype=np.int16)
+NEGOTIATION_RESULT = np.array([[NEGOTIATION_RESULTS.index(outcome[2]) for outcome in row] for row in NEGOTIATION_TABLE],
+                              dtype=np.int8)
+NEGOTIATION_ANGRY = np.array([[outcome[3] for outcome in row] for row in NEGOTIATION_TABLE], dtype=bool)
+
+RESPECT_LIGHT_ARRAY = np.array(RESPECT_LIGHT_PROBABILITY)
+
+
+def resolve_negotiations(my_codes, other_codes):
+    """
+    Resolve many conflicts at once from parallel arrays of type codes.
+    Returns arrays (action codes, rewards, result codes, becomes_angry); action and
+    result codes index NEGOTIATION_ACTIONS and NEGOTIATION_RESULTS.
+    """
+    index = (np.asarray(my_codes), np.asarray(other_codes))
+    return NEGOTIATION_ACTION[index], NEGOTIATION_REWARD[index], NEGOTIATION_RESULT[index], NEGOTIATION_ANGRY[index]
+
+
+def respect_light_decisions(light_codes, draws):
+    """
+    Bulk version of the wreckless light check: one uniform draw per agent,
+    True where the agent stops for its light.
+    """
+    return np.asarray(draws) < RESPECT_LIGHT_ARRAY[np.asarray(light_codes)]
+
+
+def skip_stop_sign_decisions(draws):
+    """
+    Bulk version of the wreckless stop sign check: True where the agent skips it.
+    """
+    return np.asarray(draws) < SKIP_STOP_SIGN_PROBABILITY
+
+
+def turn_decisions(draws):
+    """
+    Bulk version of the wreckless turn check: True where the agent changes direction.
+    """
+    return np.asarray(draws) < TURN_PROBABILITY
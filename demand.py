@@ -0,0 +1,165 @@
+import csv
+
+import numpy as np
+
+from agents import CarAgent, WrecklessAgent
+from map import startList
+
+
+AGENT_TYPES = ["cooperative", "competitive", "neutral"]
+
+
+class DemandProfile:
+    """
+    Arrival rate (cars per tick) of every entry lane for each hour of a day.
+    The profile repeats every 24 hours of simulated time.
+    """
+
+    def __init__(self, hourly_rates, ticks_per_hour=60, lanes=startList):
+        self.lanes = list(lanes)
+        self.ticks_per_hour = ticks_per_hour
+        self.hourly_rates = np.asarray(hourly_rates, dtype=float).reshape(len(self.lanes), -1)  # (lanes, hours)
+        self.hours = self.hourly_rates.shape[1]
+
+    def rates_at(self, tick):
+        hour = (tick // self.ticks_per_hour) % self.hours
+        return self.hourly_rates[:, hour]
+
+    def daily_cars(self):
+        return self.hourly_rates.sum() * self.ticks_per_hour
+
+    @classmethod
+    def constant(cls, rate, ticks_per_hour=60, lanes=startList):
+        return cls(np.full((len(lanes), 24), rate), ticks_per_hour, lanes)
+
+    @classmethod
+    def rush_hour(cls, base_rate=0.02, peak_rate=0.15, peak_hours=(8, 18), peak_width=1.5,
+                  ticks_per_hour=60, lane_weights=None, lanes=startList):
+        """
+        Base demand with a bell-shaped peak around each of `peak_hours`.
+        lane_weights ({lane: weight}) scales individual lanes, 1 by default.
+        """
+        hours = np.arange(24)
+        curve = np.zeros(24)
+        for peak in peak_hours:
+            distance = np.minimum(np.abs(hours - peak), 24 - np.abs(hours - peak))
+            curve = np.maximum(curve, np.exp(-0.5 * (distance / peak_width) ** 2))
+        hourly = base_rate + (peak_rate - base_rate) * curve
+
+        weights = np.array([(lane_weights or {}).get(lane, 1.0) for lane in lanes])
+        return cls(weights[:, None] * hourly[None, :], ticks_per_hour, lanes)
+
+    @classmethod
+    def from_od_matrix(cls, od_matrix, hourly_totals, ticks_per_hour=60, lanes=startList):
+        """
+        Build a profile from an origin -> destination trip matrix ({origin: {destination: trips}})
+        and the total number of cars entering per hour (24 values).
+        In this map a car's destination follows from its entry lane, so only the
+        origin totals of the matrix are used to split the demand between lanes.
+        """
+        origin_trips = np.array([sum(od_matrix.get(lane, {}).values()) for lane in lanes], dtype=float)
+        if origin_trips.sum() == 0:
+            raise ValueError("The OD matrix has no trips from any entry lane")
+        shares = origin_trips / origin_trips.sum()
+        hourly_totals = np.asarray(hourly_totals, dtype=float)
+        return cls(shares[:, None] * hourly_totals[None, :] / ticks_per_hour, ticks_per_hour, lanes)
+
+    @classmethod
+    def from_csv(cls, path, ticks_per_hour=60, lanes=startList):
+        """
+        Read rows of x, y, hour, rate (cars per tick) into a profile.
+        Lanes or hours that are missing get a rate of 0.
+        """
+        index = {lane: i for i, lane in enumerate(lanes)}
+        rates = np.zeros((len(lanes), 24))
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                lane = (int(row["x"]), int(row["y"]))
+                if lane not in index:
+                    raise ValueError(f"{lane} is not an entry lane")
+                rates[index[lane], int(row["hour"]) % 24] = float(row["rate"])
+        return cls(rates, ticks_per_hour, lanes)
+
+
+class DemandInjector:
+    """
+    Injects cars following a DemandProfile.
+
+    Every tick the arrivals of all lanes are drawn at once and added to a bounded queue
+    per entry lane (arrivals past `queue_capacity` are dropped and counted). A lane
+    releases one car when its entry cell has no car on it, so spawns never stack.
+    Cars that finish their trip are handed back by the model and reused for later arrivals.
+    """
+
+    def __init__(self, profile, queue_capacity=50, wreckless_share=0.1, type_weights=None, seed=0):
+        self.profile = profile
+        self.lanes = profile.lanes
+        self.queue_capacity = queue_capacity
+        self.wreckless_share = wreckless_share
+        weights = np.ones(3) if type_weights is None else np.asarray(type_weights, dtype=float)
+        self.type_probabilities = weights / weights.sum()
+        self.rng = np.random.default_rng(seed)
+
+        self.queues = np.zeros(len(self.lanes), dtype=np.int64)
+        self.arrived = 0
+        self.spawned = 0
+        self.dropped = 0
+        self.car_pool = []
+        self.wreckless_pool = []
+
+    def enqueue(self, lane, count=1):
+        """
+        Add cars waiting to enter at a lane, e.g. the model's initial cars.
+        """
+        self.queues[self.lanes.index(lane)] += count
+        self.arrived += count
+
+    def queue_lengths(self):
+        return {lane: int(length) for lane, length in zip(self.lanes, self.queues)}
+
+    def recycle(self, car):
+        if isinstance(car, WrecklessAgent):
+            self.wreckless_pool.append(car)
+        else:
+            self.car_pool.append(car)
+
+    def new_car(self, model, lane, wreckless, type_code):
+        if wreckless:
+            if self.wreckless_pool:
+                car = self.wreckless_pool.pop()
+                car.respawn(lane)
+                return car
+            return WrecklessAgent(model.next_id(), model, lane)
+
+        agent_type = AGENT_TYPES[type_code]
+        if self.car_pool:
+            car = self.car_pool.pop()
+            car.respawn(lane, agent_type)
+            return car
+        return CarAgent(model.next_id(), model, lane, agent_type)
+
+    def step(self, model):
+        arrivals = self.rng.poisson(self.profile.rates_at(model.current_time))
+        self.arrived += int(arrivals.sum())
+        self.queues += arrivals
+        overflow = np.maximum(self.queues - self.queue_capacity, 0)
+        self.dropped += int(overflow.sum())
+        self.queues -= overflow
+
+        waiting = np.flatnonzero(self.queues)
+        if not waiting.size:
+            return
+
+        # Draw the kind of every car that may be released this tick in one go
+        wreckless = self.rng.random(waiting.size) < self.wreckless_share
+        type_codes = self.rng.choice(3, size=waiting.size, p=self.type_probabilities)
+
+        for i, lane_index in enumerate(waiting):
+            lane = self.lanes[lane_index]
+            if any(isinstance(agent, (CarAgent, WrecklessAgent)) for agent in model.grid.get_cell_list_contents([lane])):
+                continue  # Entry cell still occupied, the car keeps waiting in the queue
+            car = self.new_car(model, lane, wreckless[i], type_codes[i])
+            model.schedule.add(car)
+            model.grid.place_agent(car, lane)
+            self.queues[lane_index] -= 1
+            self.spawned += 1
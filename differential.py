@@ -0,0 +1,186 @@
+import contextlib
+import math
+import os
+import random
+from multiprocessing import Pool
+
+import numpy as np
+
+from agents import BuildingAgent, CarAgent
+from runs import build_model, run_configuration
+
+
+# Results of run_configuration compared by the distributional tests
+DISTRIBUTION_METRICS = ("throughput", "mean_travel_time", "mean_delay", "p95_delay")
+
+
+def tick_state(model):
+    """
+    Everything two engines must agree on after a tick, as (occupancy, aggregates).
+    occupancy maps every light, car and pedestrian id to its (pos, state); aggregates
+    holds the model counters and the sums of the car counters. The counters of agents
+    an active-set scheduler has not caught up yet are computed from their idle deltas
+    without writing to them, so the engine under test runs exactly as in production.
+    """
+    pending_ticks = getattr(model.schedule, "pending_ticks", None)
+
+    occupancy = {}
+    for light in model.traffic_lights:
+        occupancy[str(light.unique_id)] = (light.pos, light.state)
+    cars = []
+    for agent in model.schedule.agents:
+        if isinstance(agent, BuildingAgent):
+            continue
+        occupancy[str(agent.unique_id)] = (agent.pos, getattr(agent, "state", None))
+        if isinstance(agent, CarAgent):
+            cars.append(agent)
+
+    travel_time = model.trip_stats.combined("travel_time")
+    car_counters = []
+    for car in cars:
+        counters = car.idle_counters()
+        lag = pending_ticks(car) if pending_ticks is not None else 0
+        if lag:
+            counters = tuple(value + delta * lag for value, delta in zip(counters, car.idle_deltas))
+        car_counters.append(counters)
+    counters = [sum(values) for values in zip(*car_counters)] or [0] * 5
+    aggregates = {
+        "happy": sum(1 for car in cars if car.state == "happy"),
+        "angry": sum(1 for car in cars if car.state == "angry"),
+        "completed": model.completedCars,
+        "trips": travel_time.count,
+        "travel_time": travel_time.total,
+        "jammed": counters[0],
+        "happiness": counters[1],
+        "red_wait": counters[2],
+        "blocked": counters[3],
+        "negotiations": counters[4],
+    }
+    return occupancy, aggregates
+
+
+def differences(reference, candidate, limit):
+    """
+    (key, reference value, candidate value) for every key whose values differ, sorted by key.
+    A key missing on one side shows up with None on that side.
+    """
+    result = []
+    for key in sorted(set(reference) | set(candidate)):
+        if reference.get(key) != candidate.get(key):
+            result.append((key, reference.get(key), candidate.get(key)))
+            if len(result) >= limit:
+                break
+    return result
+
+
+def first_divergence(reference, candidate, seed=0, steps=200, limit=10):
+    """
+    Run two engine configurations from the same seed in lockstep and return the first
+    tick where they differ, or None if they agree for all `steps` ticks.
+    Tick 0 is the state right after construction. The report lists up to `limit`
+    differing agents (kind "occupancy") or counters (kind "aggregate").
+    """
+    caller_state = random.getstate()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            # Both models draw from the global random module, so each one gets its own
+            # stream: its random state is swapped in around every step
+            models = []
+            streams = []
+            for config in (reference, candidate):
+                models.append(build_model(config, seed))
+                streams.append(random.getstate())
+
+            for tick in range(steps + 1):
+                if tick:
+                    for i, model in enumerate(models):
+                        random.setstate(streams[i])
+                        model.step()
+                        streams[i] = random.getstate()
+
+                (ref_occupancy, ref_aggregates), (cand_occupancy, cand_aggregates) = map(tick_state, models)
+                for kind, ref_values, cand_values in (("occupancy", ref_occupancy, cand_occupancy),
+                                                      ("aggregate", ref_aggregates, cand_aggregates)):
+                    diff = differences(ref_values, cand_values, limit)
+                    if diff:
+                        return {"seed": seed, "tick": tick, "kind": kind, "differences": diff}
+        return None
+    finally:
+        random.setstate(caller_state)
+
+
+def ks_test(a, b):
+    """
+    Two-sample Kolmogorov-Smirnov test, returns (statistic, asymptotic p-value).
+    """
+    a = np.sort(np.asarray(a, dtype=float))
+    b = np.sort(np.asarray(b, dtype=float))
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, values, side="right") / len(a)
+    cdf_b = np.searchsorted(b, values, side="right") / len(b)
+    statistic = float(np.max(np.abs(cdf_a - cdf_b)))
+    if statistic == 0:
+        return 0.0, 1.0
+
+    en = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (en + 0.12 + 0.11 / en) * statistic
+    p_value = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return statistic, min(1.0, max(0.0, p_value))
+
+
+def compare_distributions(reference_runs, candidate_runs, metrics=DISTRIBUTION_METRICS, alpha=0.01):
+    """
+    KS test of every metric between two lists of run_configuration results.
+    A metric passes when the test does not reject equal distributions at level `alpha`.
+    """
+    report = {}
+    for metric in metrics:
+        a = [run[metric] for run in reference_runs]
+        b = [run[metric] for run in candidate_runs]
+        statistic, p_value = ks_test(a, b)
+        report[metric] = {
+            "reference_mean": float(np.mean(a)),
+            "candidate_mean": float(np.mean(b)),
+            "statistic": statistic,
+            "p_value": p_value,
+            "passed": p_value >= alpha,
+        }
+    return report
+
+
+def check_engines(reference, candidate, seeds=range(8), steps=200, replicates=0, replicate_steps=500,
+                  metrics=DISTRIBUTION_METRICS, alpha=0.01, processes=None):
+    """
+    Differential check of a candidate engine against the reference one. Both are
+    configurations as used by runs.py, e.g. {"activation": "simultaneous"} and
+    {"activation": "active_set"} on top of the same scenario.
+
+    Every seed in `seeds` gets an exact same-seed comparison (first_divergence). With
+    `replicates` > 0, both engines also run that many independent seeds (disjoint
+    between engines) and their results are compared with KS tests, for engines that
+    are only expected to match in distribution. All runs share one worker pool.
+    """
+    seeds = list(seeds)
+    exact_jobs = [(reference, candidate, seed, steps) for seed in seeds]
+    replicate_jobs = [(reference, replicate_steps, seed) for seed in range(replicates)]
+    replicate_jobs += [(candidate, replicate_steps, seed) for seed in range(replicates, 2 * replicates)]
+
+    if processes == 1:
+        divergences = [first_divergence(*job) for job in exact_jobs]
+        runs = [run_configuration(*job) for job in replicate_jobs]
+    else:
+        with Pool(processes) as pool:
+            pending = pool.starmap_async(run_configuration, replicate_jobs)
+            divergences = pool.starmap(first_divergence, exact_jobs)
+            runs = pending.get()
+
+    report = {
+        "divergences": [divergence for divergence in divergences if divergence is not None],
+        "seeds": seeds,
+    }
+    if replicates:
+        report["distributions"] = compare_distributions(runs[:replicates], runs[replicates:], metrics, alpha)
+    report["passed"] = not report["divergences"] and all(
+        result["passed"] for result in report.get("distributions", {}).values()
+    )
+    return report
@@ -0,0 +1,140 @@
+import numpy as np
+
+from runs import run_ensemble, load_results
+
+
+FEATURES = ("num_cars", "wreckless_share", "cooperative_share", "competitive_share", "green_time", "yellow_time",
+            "arrival_rate")
+TARGETS = ("throughput", "mean_travel_time", "p95_travel_time", "mean_delay", "p95_delay")
+
+# Values used for features missing from a configuration (the model defaults)
+FEATURE_DEFAULTS = {
+    "num_cars": 20,
+    "wreckless_share": 0.1,
+    "cooperative_share": 1 / 3,
+    "competitive_share": 1 / 3,
+    "green_time": 6,
+    "yellow_time": 0,
+    "arrival_rate": 0.0,
+}
+
+
+class Emulator:
+    """
+    Cheap surrogate of IntersectionModel fitted on recorded run results.
+    It is a bootstrap ensemble of quadratic ridge regressions: the ensemble mean is
+    the prediction and the spread between members tells how much to trust it.
+    The training residual (`noise`, mostly seed-to-seed variation that more runs
+    cannot remove) is reported separately and does not count as uncertainty.
+    """
+
+    def __init__(self, features=FEATURES, targets=TARGETS, members=20, ridge=1e-3, seed=0):
+        self.features = tuple(features)
+        self.targets = tuple(targets)
+        self.members = members
+        self.ridge = ridge
+        self.rng = np.random.default_rng(seed)
+        self.weights = None  # (members, terms, targets)
+        self.training_rows = []
+
+    def feature_matrix(self, configs):
+        rows = [[float(config.get(name, FEATURE_DEFAULTS.get(name, 0.0))) for name in self.features] for config in configs]
+        return np.array(rows, dtype=float).reshape(len(rows), len(self.features))
+
+    def expand(self, x):
+        """
+        Standardize the features and add a bias, linear and pairwise product terms.
+        """
+        z = (x - self.mean) / self.scale
+        columns = [np.ones((len(z), 1)), z]
+        for i in range(z.shape[1]):
+            columns.append(z[:, i:i + 1] * z[:, i:])
+        return np.hstack(columns)
+
+    def fit(self, rows):
+        """
+        Fit the ensemble on result rows (dicts holding both features and targets).
+        """
+        self.training_rows = list(rows)
+        x = self.feature_matrix(rows)
+        y = np.array([[float(row[name]) for name in self.targets] for row in rows], dtype=float)
+
+        self.mean = x.mean(axis=0)
+        self.scale = x.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.low = x.min(axis=0)
+        self.high = x.max(axis=0)
+        self.target_scale = np.abs(y).mean(axis=0) + 1e-9
+
+        design = self.expand(x)
+        penalty = self.ridge * np.eye(design.shape[1])
+        penalty[0, 0] = 0.0  # Don't shrink the bias
+
+        weights = []
+        for _ in range(self.members):
+            sample = self.rng.integers(0, len(rows), len(rows))
+            a = design[sample]
+            weights.append(np.linalg.solve(a.T @ a + penalty, a.T @ y[sample]))
+        self.weights = np.stack(weights)
+        self.noise = np.sqrt(((design @ self.weights.mean(axis=0) - y) ** 2).mean(axis=0))
+        return self
+
+    def fit_file(self, path):
+        return self.fit(load_results(path))
+
+    def predict_many(self, configs):
+        """
+        Return (mean, std) arrays of shape (configs, targets).
+        std is the disagreement between ensemble members, i.e. what more data can reduce.
+        """
+        if self.weights is None:
+            raise ValueError("Emulator has not been fitted yet")
+        design = self.expand(self.feature_matrix(configs))
+        predictions = np.einsum("nt,mto->mno", design, self.weights)
+        mean = predictions.mean(axis=0)
+        std = np.sqrt(predictions.var(axis=0))
+        return mean, std
+
+    def predict(self, config):
+        """
+        Predict the targets of one configuration as {target: (mean, std, noise)}, noise
+        being the typical run-to-run deviation of a single simulation around the mean.
+        """
+        mean, std = self.predict_many([config])
+        return {
+            name: (float(mean[0, i]), float(std[0, i]), float(self.noise[i]))
+            for i, name in enumerate(self.targets)
+        }
+
+    def uncertainty(self, configs):
+        """
+        Relative uncertainty of each configuration: the largest ensemble std / typical
+        target size, doubled for configurations outside the range seen in training.
+        Run-to-run noise is left out, so well-covered configurations score low.
+        """
+        mean, std = self.predict_many(configs)
+        score = (std / self.target_scale).max(axis=1)
+        x = self.feature_matrix(configs)
+        outside = ((x < self.low) | (x > self.high)).any(axis=1)
+        return np.where(outside, score * 2, score)
+
+    def uncertain(self, configs, threshold=0.1):
+        """
+        Configurations whose prediction is too uncertain to trust, most uncertain first.
+        These are the ones worth re-simulating for real.
+        """
+        score = self.uncertainty(configs)
+        order = np.argsort(-score)
+        return [configs[i] for i in order if score[i] > threshold]
+
+    def refine(self, configs, threshold=0.1, seeds=(0,), steps=500, processes=None):
+        """
+        Simulate the uncertain configurations, add them to the training data and refit.
+        Returns the new result rows.
+        """
+        chosen = self.uncertain(configs, threshold)
+        if not chosen:
+            return []
+        rows = run_ensemble(chosen, seeds, steps, processes)
+        self.fit(self.training_rows + rows)
+        return rows
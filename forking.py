@@ -0,0 +1,157 @@
+import contextlib
+import copy
+import os
+import pickle
+import random
+
+from agents import BuildingAgent, CarAgent, WrecklessAgent
+
+
+def summary(model):
+    """
+    Default result of a branch: a few headline numbers of the model.
+    """
+    trip_stats = model.trip_stats
+    return {
+        "time": model.current_time,
+        "completed_trips": model.completedCars,
+        "happy": sum(1 for a in model.schedule.agents if isinstance(a, CarAgent) and a.state == "happy"),
+        "angry": sum(1 for a in model.schedule.agents if isinstance(a, CarAgent) and a.state == "angry"),
+        "mean_travel_time": trip_stats.combined("travel_time").mean(),
+        "mean_delay": trip_stats.combined("delay").mean(),
+        "light_states": [light.state for light in model.traffic_lights],
+    }
+
+
+def switch_light(light_index):
+    """
+    Branch that turns a light green now.
+    """
+    def branch(model):
+        model.force_green(light_index)
+    return branch
+
+
+def inject_cars(position, count, agent_type=None, wreckless=False):
+    """
+    Branch that adds `count` cars on a start cell, e.g. inject_cars((0, 9), 50).
+    """
+    def branch(model):
+        for _ in range(count):
+            if wreckless:
+                car = WrecklessAgent(model.next_id(), model, position)
+            else:
+                car = CarAgent(model.next_id(), model, position, agent_type)
+            model.schedule.add(car)
+            model.grid.place_agent(car, position)
+    return branch
+
+
+def run_branch(model, branch, steps, measure):
+    branch(model)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(steps):
+            model.step()
+    return measure(model)
+
+
+def detach_outputs(model):
+    """
+    Keep a branch from writing to the live run's outputs: drop its metrics exporter
+    and stop its DataCollector from spilling history into the live run's directory.
+    """
+    model.metrics = None
+    if getattr(model.datacollector, "directory", None) is not None:
+        model.datacollector.directory = None
+    return model
+
+
+def copy_model(model):
+    """
+    Copy a model for a branch, sharing the buildings (static) with the original
+    instead of duplicating them. The copy is detached from the live run's outputs.
+    """
+    memo = {}
+    for agent in model.schedule.agents:
+        if isinstance(agent, BuildingAgent):
+            memo[id(agent)] = agent
+    if model.metrics is not None:
+        memo[id(model.metrics)] = None  # The exporter holds a lock and a server, don't copy it
+    return detach_outputs(copy.deepcopy(model, memo))
+
+
+def fork_branches(model, branches, steps=0, measure=summary, reseed=False):
+    """
+    Evaluate what-if branches of a live model and return their results in order.
+
+    Each branch is a callable that modifies the model in place (see switch_light and
+    inject_cars); the model is then stepped `steps` times and `measure(model)` is returned.
+    On Linux each branch runs in a forked child, so it shares every page it does not
+    write to with this process; elsewhere the model is copied with copy_model.
+    The live model is never modified.
+    By default every branch starts from the current state of the random module (common
+    random numbers), so differences between branches come from the interventions only.
+    When `reseed` is set, each branch gets its own seed drawn from that state instead.
+    If the model is being stepped by another thread, hold its lock while forking.
+    """
+    state = random.getstate()
+    seeds = None
+    if reseed:
+        # Draw from a copy so the live random stream is left untouched
+        rng = random.Random()
+        rng.setstate(state)
+        seeds = [rng.getrandbits(64) for _ in branches]
+
+    if not hasattr(os, "fork"):
+        results = []
+        for i, branch in enumerate(branches):
+            if reseed:
+                random.seed(seeds[i])
+            else:
+                random.setstate(state)
+            results.append(run_branch(copy_model(model), branch, steps, measure))
+        random.setstate(state)
+        return results
+
+    children = []
+    for i, branch in enumerate(branches):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: run the branch on its copy-on-write view of the model
+            os.close(read_fd)
+            try:
+                # The random module reseeds itself in forked children, restore the stream
+                if reseed:
+                    random.seed(seeds[i])
+                else:
+                    random.setstate(state)
+                detach_outputs(model)
+                payload = pickle.dumps((True, run_branch(model, branch, steps, measure)))
+            except BaseException as e:
+                payload = pickle.dumps((False, f"{type(e).__name__}: {e}"))
+            with os.fdopen(write_fd, "wb") as f:
+                f.write(payload)
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    results = []
+    errors = []
+    for i, (pid, read_fd) in enumerate(children):
+        with os.fdopen(read_fd, "rb") as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        if not data:
+            errors.append(f"branch {i}: child exited without a result")
+            results.append(None)
+            continue
+        ok, result = pickle.loads(data)
+        if not ok:
+            errors.append(f"branch {i}: {result}")
+            result = None
+        results.append(result)
+
+    if errors:
+        raise RuntimeError("Some branches failed: " + "; ".join(errors))
+    return results
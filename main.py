@@ -1,58 +1,11 @@
-from agents import BuildingAgent, TrafficLightAgent, CarAgent, WrecklessAgent, PersonAgent
 from models import IntersectionModel
-from mesa.visualization.modules import CanvasGrid, ChartModule
-from mesa.visualization.ModularVisualization import ModularServer
+from mesa.visualization.modules import ChartModule
+from portrayal import intersectionPortrayal, CachedCanvasGrid
+from server import BackgroundModularServer
 import random
 
-def intersectionPortrayal(agent):
-    if agent is None:
-        return
-
-    portrayal = {"Filled": "true"}
-
-    if isinstance(agent, PersonAgent):
-        portrayal["Shape"] = "circle"
-        portrayal["r"] = 0.4
-        portrayal["Color"] = "#00FF00"  # Green for pedestrians
-        portrayal["Layer"] = 4  # Higher layer to ensure visibility
-        return portrayal  # Return immediately to prioritize PersonAgent
-
-    if isinstance(agent, BuildingAgent):
-        portrayal["Shape"] = "rect"
-        portrayal["w"] = 0.8
-        portrayal["h"] = 0.8
-        portrayal["Color"] = "#808080"  # Grey for buildings
-        portrayal["Layer"] = 1
-
-    elif isinstance(agent, TrafficLightAgent):
-        portrayal["Shape"] = "rect"
-        portrayal["w"] = 0.6
-        portrayal["h"] = 0.6
-        if agent.state == "green":
-            portrayal["Color"] = "green"
-        elif agent.state == "red":
-            portrayal["Color"] = "red"
-        else:
-            portrayal["Color"] = "yellow"
-        portrayal["Layer"] = 2
-
-    elif isinstance(agent, CarAgent):
-        portrayal["Shape"] = "circle"
-        portrayal["r"] = 0.5
-        portrayal["Color"] = "#0000FF" if agent.state == "happy" else "#FF0000"
-        portrayal["Layer"] = 3
-
-    elif isinstance(agent, WrecklessAgent):
-        portrayal["Shape"] = "circle"
-        portrayal["r"] = 0.5
-        portrayal["Color"] = "#FFFF00"  # Yellow for wreckless agents
-        portrayal["Layer"] = 3
-
-    return portrayal
-
-
-# Create the CanvasGrid
-grid = CanvasGrid(intersectionPortrayal, 23, 23, 500, 500)
+# Create the CanvasGrid (buildings are drawn from a precomputed static layer)
+grid = CachedCanvasGrid(intersectionPortrayal, 23, 23, 500, 500)
 
 # Create the ChartModule for displaying advances by agent type
 advance_chart = ChartModule(
@@ -80,12 +33,14 @@ emotion_chart = ChartModule(
     data_collector_name='datacollector'
 )
 
-# Set up the ModularServer to run the simulation with the grid and advance chart
-server = ModularServer(
+# Set up the server to run the simulation with the grid and advance chart
+# The model is stepped in a background thread, browsers only receive the latest frame
+server = BackgroundModularServer(
     IntersectionModel,
     [grid, emotion_chart],  # Include both grid and advance chart in the server
     "Modelo de Intersección - Multiagentes",
-    model_parameters
+    model_parameters,
+    steps_per_second=5
 )
 
 server.port = 8521  # Default port
@@ -249,4 +249,20 @@ endList = [(8, 0), (9, 0), (10, 0), (22, 8), (22, 9), (22, 10),
 
 #Semaphores = [ (( 9, 15), "red"), (( 15, 13), "red"), ((7, 9), "red"), (( 13, 7), "red") ]
 Semaphores = [  (( 9, 15), "red"), (( 15, 13), "red"), ((7, 9), "red"), (( 13, 7), "red")]
-#   izquierda arriba, derecha arriba, izquierda abajo, derecha abajo,
\ No newline at end of file
+#   izquierda arriba, derecha arriba, izquierda abajo, derecha abajo,
+
+# Traffic light controlling each entry lane
+semaphorePositions = {
+    (8, 22): (9, 15), (9, 22): (9, 15), (10, 22): (9, 15),
+    (22, 12): (15, 13), (22, 13): (15, 13), (22, 14): (15, 13),
+    (12, 0): (13, 7), (13, 0): (13, 7), (14, 0): (13, 7),
+    (0, 8): (7, 9), (0, 9): (7, 9), (0, 10): (7, 9),
+}
+
+# Cells where a wreckless agent may change direction, and the new direction
+turnPoints = {
+    (9, 11): "right", (10, 11): "right", (11, 11): "right",  # Down to right
+    (13, 14): "left", (14, 14): "left", (15, 14): "left",  # Up to left
+    (13, 10): "up", (13, 9): "up", (15, 11): "up",  # Right to up
+    (10, 13): "right", (10, 14): "right", (15, 14): "right",  # Left to right
+}
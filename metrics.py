@@ -0,0 +1,141 @@
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from agents import CarAgent
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    GET /latest              -> last tick as JSON
+    GET /since?tick=N&limit=M -> ticks after N as JSON lines (one batch per request)
+    GET /metrics             -> last tick in Prometheus text format
+    """
+
+    def do_GET(self):
+        exporter = self.server.exporter
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/latest":
+            self.send_body(json.dumps(exporter.latest()), "application/json")
+        elif url.path == "/since":
+            try:
+                tick = int(query.get("tick", ["-1"])[0])
+                limit = int(query.get("limit", ["1000"])[0])
+            except ValueError:
+                self.send_error(400, "tick and limit must be integers")
+                return
+            lines = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in exporter.since(tick, limit))
+            self.send_body(lines, "application/x-ndjson")
+        elif url.path == "/metrics":
+            self.send_body(exporter.prometheus(), "text/plain; version=0.0.4")
+        else:
+            self.send_error(404)
+
+    def send_body(self, text, content_type):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the simulation console clean
+
+
+class MetricsExporter:
+    """
+    Serves the model's per-tick counters over a local HTTP endpoint.
+    The model only appends one small dict per tick to a ring buffer; all encoding
+    and networking happens in the server thread, so scraping does not slow stepping.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, history=10000):
+        self.host = host
+        self.port = port
+        self.rows = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+        self.last_completed = 0
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.exporter = self
+        self.port = self.server.server_address[1]  # Actual port when 0 was requested
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def record(self, model):
+        """
+        Store the counters of the current tick, reusing the values the DataCollector
+        just computed. The only extra pass over the agents counts the cars waiting at
+        each red light, the queue of every light whether or not demand is attached.
+        """
+        model_vars = model.datacollector.model_vars
+        light_index = {light: i for i, light in enumerate(model.traffic_lights)}
+        red_queues = [0] * len(light_index)
+        for agent in model.schedule.agents:
+            if isinstance(agent, CarAgent) and agent.idle == "red":
+                red_queues[light_index[agent.light_seen]] += 1
+        row = {
+            "tick": model.current_time,
+            "happy": model_vars["HappyCars"][-1],
+            "angry": model_vars["AngryCars"][-1],
+            "completed": model.completedCars,
+            "throughput": model.completedCars - self.last_completed,
+            "lights": "".join(light.state[0].upper() for light in model.traffic_lights),
+            "red_queues": red_queues,
+        }
+        if model.demand is not None:
+            row["queues"] = model.demand.queues.tolist()
+        self.last_completed = model.completedCars
+        with self.lock:
+            self.rows.append(row)
+
+    def latest(self):
+        with self.lock:
+            return self.rows[-1] if self.rows else {}
+
+    def since(self, tick, limit=1000):
+        """
+        Rows recorded after `tick`, oldest first, at most `limit` of them.
+        """
+        with self.lock:
+            rows = list(self.rows)
+        start = 0
+        for i in range(len(rows) - 1, -1, -1):
+            if rows[i]["tick"] <= tick:
+                start = i + 1
+                break
+        return rows[start:start + limit]
+
+    def prometheus(self):
+        row = self.latest()
+        if not row:
+            return ""
+        lines = [
+            f"intersection_tick {row['tick']}",
+            f"intersection_happy_cars {row['happy']}",
+            f"intersection_angry_cars {row['angry']}",
+            f"intersection_completed_trips_total {row['completed']}",
+        ]
+        for i, state in enumerate(row["lights"]):
+            lines.append(f'intersection_light_green{{light="{i}"}} {1 if state == "G" else 0}')
+        for i, waiting in enumerate(row["red_queues"]):
+            lines.append(f'intersection_cars_waiting_at_red{{light="{i}"}} {waiting}')
+        for i, length in enumerate(row.get("queues", [])):
+            lines.append(f'intersection_queue_length{{lane="{i}"}} {length}')
+        return "\n".join(lines) + "\n"
@@ -5,36 +5,68 @@ from mesa.datacollection import DataCollector
 import random
 from agents import BuildingAgent, TrafficLightAgent, CarAgent, WrecklessAgent, PersonAgent
 from map import optionMap, startList, endList, Semaphores
+from timing import TimingWheel
+from analytics import TripStats
+from activation import ActiveSetActivation, WatchedMultiGrid
+from collector import RollingDataCollector
 
 
 class IntersectionModel(Model):
-    def __init__(self, size, num_lights, num_cars, num_pedestrians):
-        self.schedule = SimultaneousActivation(self)
-        self.grid = MultiGrid(size, size, torus=True)
+    def __init__(self, size, num_lights, num_cars, num_pedestrians, green_time=6, yellow_time=0,
+                 wreckless_share=0.1, type_weights=None, green_times=None, phase_order=None,
+                 activation="simultaneous", demand=None, metrics=None, collector_window=None, collector_dir=None):
+        # "active_set" only steps the agents that can act this tick, with the same results
+        self.active_set = activation == "active_set"
+        if self.active_set:
+            self.schedule = ActiveSetActivation(self)
+            self.grid = WatchedMultiGrid(size, size, torus=True, on_change=self.schedule.cell_changed)
+        else:
+            self.schedule = SimultaneousActivation(self)
+            self.grid = MultiGrid(size, size, torus=True)
         self.num_lights = num_lights
         self.num_cars = num_cars
         self.current_time = 0
         self.current_id = 0
         
         self.num_pedestrians = num_pedestrians
+        self.wreckless_share = wreckless_share
+        self.type_weights = type_weights  # Weights for cooperative, competitive, neutral (None = uniform)
+        self.demand = demand  # Optional DemandInjector adding cars over time
+        self.metrics = metrics  # Optional MetricsExporter serving per-tick counters
         self.running = True
         self.completedCars = 0
         self.num_cars = num_cars
         self.traffic_lights = []
         self.light_index = 0  # Start cycling from the first traffic light
 
+        # Light phase changes are scheduled on a timing wheel instead of counted down every tick
+        self.green_time = green_time
+        self.green_times = green_times  # Optional green time per light, overrides green_time
+        self.yellow_time = yellow_time  # 0 skips the yellow phase
+        self.phase_order = phase_order  # Order in which lights get green (default: creation order)
+        self.phase_position = 0
+        self.light_wheel = TimingWheel()
+
         # Advance counters by agent type
         self.cooperative_advances = 0
         self.competitive_advances = 0
         self.neutral_advances = 0
 
+        # Travel time and delay histograms per origin -> destination pair
+        self.trip_stats = TripStats()
+
         # DataCollector to record advances by agent type
-        self.datacollector = DataCollector(
-            {
-                "HappyCars": lambda m: sum(1 for a in m.schedule.agents if isinstance(a, CarAgent) and a.state == "happy"),
-                "AngryCars": lambda m: sum(1 for a in m.schedule.agents if isinstance(a, CarAgent) and a.state == "angry")
-            }
-        )
+        model_reporters = {
+            "HappyCars": lambda m: sum(1 for a in m.schedule.agents if isinstance(a, CarAgent) and a.state == "happy"),
+            "AngryCars": lambda m: sum(1 for a in m.schedule.agents if isinstance(a, CarAgent) and a.state == "angry"),
+            "CompletedTrips": lambda m: m.completedCars
+        }
+        if collector_window is None and collector_dir is None:
+            self.datacollector = DataCollector(model_reporters)
+        else:
+            # Long runs: keep only a window in memory, spill full history to collector_dir
+            self.datacollector = RollingDataCollector(model_reporters, window=collector_window or 1000,
+                                                      directory=collector_dir)
 
         middle_lane = size // 2
         self.create_buildings(size, middle_lane)
@@ -59,16 +91,21 @@ class IntersectionModel(Model):
         for position, _ in Semaphores:
             unique_id = self.next_id()
             traffic_light = TrafficLightAgent(unique_id, self, position, "red")  # Default state is red
-            self.schedule.add(traffic_light)
+            # Lights are driven by light_wheel, so they are not added to the scheduler
             self.grid.place_agent(traffic_light, position)
             self.traffic_lights.append(traffic_light)
 
+        if self.green_times is None:
+            self.green_times = [self.green_time] * len(self.traffic_lights)
+        if self.phase_order is None:
+            self.phase_order = list(range(len(self.traffic_lights)))
+
         # Set the first traffic light to green
         if self.traffic_lights:
-            self.light_index = 0
+            self.phase_position = 0
+            self.light_index = self.phase_order[self.phase_position]
             first_light = self.traffic_lights[self.light_index]
-            first_light.state = "green"
-            first_light.timer = 6  # Green lasts 6 seconds
+            self.set_green(first_light)
             print(f"Traffic light at {first_light.pos} initialized to green.")
     def create_pedestrians(self):
         """
@@ -96,35 +133,109 @@ class IntersectionModel(Model):
 
 
     def create_car_agents(self):
+        if self.demand is not None:
+            # The initial cars wait in the entry queues like any other arrival, so they
+            # enter one per lane instead of stacking on the entry cells
+            for _ in range(self.num_cars):
+                self.demand.enqueue(random.choice(self.demand.lanes))
+            return
+
         for _ in range(self.num_cars):
             starting_pos = random.choice(startList)
             unique_id = self.next_id()
             
-            # 10% chance for the car to be a wreckless agent
-            if random.random() < 0.1:
+            # 10% chance (by default) for the car to be a wreckless agent
+            if random.random() < self.wreckless_share:
                 c = WrecklessAgent(unique_id, self, starting_pos)
             else:
-                agent_type = random.choice(["cooperative", "competitive", "neutral"])
+                if self.type_weights is None:
+                    agent_type = random.choice(["cooperative", "competitive", "neutral"])
+                else:
+                    agent_type = random.choices(["cooperative", "competitive", "neutral"], self.type_weights)[0]
                 c = CarAgent(unique_id, self, starting_pos, agent_type)
             
             self.schedule.add(c)
             self.grid.place_agent(c, starting_pos)
 
 
-    def step(self):
-        current_light = self.traffic_lights[self.light_index]
+    def set_green(self, light):
+        """
+        Turn a light green and schedule the end of its green phase.
+        The light stays green for the tick it switches plus its green time in more ticks.
+        """
+        green_time = self.green_times[self.light_index]  # light is always the one at light_index
+        light.state = "green"
+        self.light_changed(light)
+        next_state = "yellow" if self.yellow_time > 0 else "red"
+        self.light_wheel.schedule(green_time + 1, (light, next_state))
 
-        # Manage the current light's timing
-        if current_light.timer > 0:
-            current_light.timer -= 1
+    def change_light(self, light, new_state):
+        """
+        Apply a scheduled phase change and schedule the one that follows it.
+        """
+        if new_state == "yellow":
+            light.state = "yellow"
+            self.light_changed(light)
+            self.light_wheel.schedule(self.yellow_time, (light, "red"))
         else:
-            current_light.state = "red"
-            self.light_index = (self.light_index + 1) % len(self.traffic_lights)
-            next_light = self.traffic_lights[self.light_index]
-            next_light.state = "green"
-            next_light.timer = 6  # Green lasts 6 seconds
+            # End of the cycle for this light, hand green to the next one
+            light.state = "red"
+            self.light_changed(light)
+            self.phase_position = (self.phase_position + 1) % len(self.phase_order)
+            self.light_index = self.phase_order[self.phase_position]
+            self.set_green(self.traffic_lights[self.light_index])
+
+    def complete_trip(self, car):
+        """
+        Record a finished trip of a car (or wreckless agent) that just reached an exit cell,
+        or, with a demand profile, that is about to drive off the edge of the map.
+        """
+        self.completedCars += 1
+        self.trip_stats.record(
+            car.starting_pos,
+            car.pos,
+            self.current_time - car.trip_start,
+            car.red_wait,
+            car.blocked_ticks,
+            car.negotiations
+        )
+
+        # With a demand profile cars leave the map and are reused for new arrivals
+        if self.demand is not None:
+            self.grid.remove_agent(car)
+            self.schedule.remove(car)
+            self.demand.recycle(car)
+
+    def force_green(self, light_index):
+        """
+        Turn a light green right now and restart the cycle from it, all other lights go red.
+        """
+        self.light_wheel.clear()
+        for light in self.traffic_lights:
+            light.state = "red"
+            self.light_changed(light)
+        if light_index in self.phase_order:
+            self.phase_position = self.phase_order.index(light_index)
+        self.light_index = light_index
+        self.set_green(self.traffic_lights[light_index])
+
+    def light_changed(self, light):
+        if self.active_set:
+            self.schedule.light_changed(light)
+
+    def step(self):
+        self.current_time += 1
+
+        # Only the lights whose phase ends this tick are touched
+        for light, new_state in self.light_wheel.advance():
+            self.change_light(light, new_state)
+
+        if self.demand is not None:
+            self.demand.step(self)
 
         self.datacollector.collect(self)
+        if self.metrics is not None:
+            self.metrics.record(self)
         self.schedule.step()
 
 
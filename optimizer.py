@@ -0,0 +1,157 @@
+import numpy as np
+
+from runs import run_ensemble
+
+
+# Objective name -> sign so that lower scores are always better
+OBJECTIVES = {
+    "mean_delay": 1,
+    "p95_delay": 1,
+    "mean_travel_time": 1,
+    "p95_travel_time": 1,
+    "throughput": -1,
+}
+
+
+class SignalOptimizer:
+    """
+    Cross-entropy search over light timings: green time of every light (the green split,
+    whose sum sets the cycle length) and the order in which lights get green.
+
+    Candidates are evaluated with parallel headless runs that all share the same seeds
+    (common random numbers), and losing candidates are dropped early by successive
+    halving, so most of the simulation budget goes to the promising ones.
+    """
+
+    def __init__(self, base_config=None, num_lights=4, green_range=(2, 15), max_cycle=None,
+                 objective="mean_delay", population=16, elite_fraction=0.25, seeds=(0, 1, 2, 3),
+                 seeds_per_rung=1, steps=300, processes=None, smoothing=0.7, rng_seed=0):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}, expected one of {sorted(OBJECTIVES)}")
+        self.base_config = dict(base_config or {})
+        self.num_lights = num_lights
+        self.green_range = green_range
+        self.max_cycle = max_cycle
+        if max_cycle is not None:
+            shortest = num_lights * (green_range[0] + 1 + self.base_config.get("yellow_time", 0))
+            if shortest > max_cycle:
+                raise ValueError(f"max_cycle {max_cycle} is shorter than the shortest possible cycle {shortest}")
+        self.objective = objective
+        self.population = population
+        self.num_elites = max(1, int(round(population * elite_fraction)))
+        self.seeds = tuple(seeds)
+        self.seeds_per_rung = seeds_per_rung
+        self.steps = steps
+        self.processes = processes
+        self.smoothing = smoothing
+        self.rng = np.random.default_rng(rng_seed)
+
+        # Sampling distribution: a normal per green time, and a matrix of probabilities
+        # order_probabilities[position][light] for the phase order
+        low, high = green_range
+        self.green_mean = np.full(num_lights, (low + high) / 2)
+        self.green_std = np.full(num_lights, (high - low) / 2)
+        self.order_probabilities = np.full((num_lights, num_lights), 1 / num_lights)
+
+        self.best = None  # (score, candidate)
+        self.history = []
+
+    def sample_order(self):
+        remaining = list(range(self.num_lights))
+        order = []
+        for position in range(self.num_lights):
+            weights = self.order_probabilities[position, remaining]
+            weights = weights / weights.sum()
+            light = remaining[self.rng.choice(len(remaining), p=weights)]
+            remaining.remove(light)
+            order.append(light)
+        return order
+
+    def sample(self):
+        """
+        Draw one candidate: {"green_times": [...], "phase_order": [...]}.
+        """
+        low, high = self.green_range
+        greens = np.clip(np.rint(self.rng.normal(self.green_mean, self.green_std)), low, high).astype(int)
+
+        # Each phase lasts green + 1 ticks plus the yellow time
+        if self.max_cycle is not None:
+            yellow = self.base_config.get("yellow_time", 0)
+            cycle = int((greens + 1 + yellow).sum())
+            if cycle > self.max_cycle:
+                # Every light keeps the minimum green; only the time above it is scaled down
+                budget = self.max_cycle - self.num_lights * (1 + yellow + low)
+                extra = greens - low
+                greens = low + np.floor(extra * budget / extra.sum()).astype(int)
+
+        return {"green_times": [int(g) for g in greens], "phase_order": self.sample_order()}
+
+    def score(self, row):
+        return OBJECTIVES[self.objective] * row[self.objective]
+
+    def evaluate(self, candidates):
+        """
+        Successive halving: run every candidate on the first rung of seeds, keep the better
+        half, run the survivors on the next rung, and so on.
+        Returns a list of (mean score, candidate) sorted best first.
+        """
+        scores = [[] for _ in candidates]
+        alive = list(range(len(candidates)))
+        eliminated = []
+        rungs = [self.seeds[i:i + self.seeds_per_rung] for i in range(0, len(self.seeds), self.seeds_per_rung)]
+
+        for rung_index, rung in enumerate(rungs):
+            configs = [dict(self.base_config, **candidates[i]) for i in alive]
+            rows = run_ensemble(configs, rung, self.steps, self.processes)
+            for j, i in enumerate(alive):
+                scores[i].extend(self.score(row) for row in rows[j * len(rung):(j + 1) * len(rung)])
+
+            alive.sort(key=lambda i: np.mean(scores[i]))
+            if rung_index < len(rungs) - 1:
+                keep = max(self.num_elites, len(alive) // 2)
+                eliminated = alive[keep:] + eliminated
+                alive = alive[:keep]
+
+        ranked = alive + eliminated
+        return [(float(np.mean(scores[i])), candidates[i]) for i in ranked]
+
+    def update(self, elites):
+        """
+        Move the sampling distribution towards the elite candidates.
+        """
+        greens = np.array([candidate["green_times"] for candidate in elites], dtype=float)
+        a = self.smoothing
+        self.green_mean = a * greens.mean(axis=0) + (1 - a) * self.green_mean
+        self.green_std = a * greens.std(axis=0) + (1 - a) * self.green_std
+
+        counts = np.zeros((self.num_lights, self.num_lights))
+        for candidate in elites:
+            for position, light in enumerate(candidate["phase_order"]):
+                counts[position, light] += 1
+        frequencies = counts / len(elites)
+        self.order_probabilities = a * frequencies + (1 - a) * self.order_probabilities
+
+    def step(self):
+        """
+        One iteration: sample a population, evaluate it, update the distribution.
+        """
+        candidates = [self.sample() for _ in range(self.population)]
+        ranked = self.evaluate(candidates)
+        self.update([candidate for _, candidate in ranked[:self.num_elites]])
+
+        score, candidate = ranked[0]
+        if self.best is None or score < self.best[0]:
+            self.best = (score, candidate)
+        self.history.append(score)
+        return ranked[0]
+
+    def run(self, iterations=10, tolerance=0.5):
+        """
+        Iterate until `iterations` are done or every green time has converged
+        (std below `tolerance` ticks). Returns (best score, best candidate).
+        """
+        for _ in range(iterations):
+            self.step()
+            if (self.green_std < tolerance).all():
+                break
+        return self.best
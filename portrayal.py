@@ -0,0 +1,125 @@
+from types import MappingProxyType
+
+from mesa.visualization.modules import CanvasGrid
+
+from agents import BuildingAgent, TrafficLightAgent, CarAgent, WrecklessAgent, PersonAgent
+
+
+def build_portrayal(agent_class, state):
+    """
+    Portrayal of an agent class in a given state.
+    """
+    portrayal = {"Filled": "true"}
+
+    if issubclass(agent_class, PersonAgent):
+        portrayal["Shape"] = "circle"
+        portrayal["r"] = 0.4
+        portrayal["Color"] = "#00FF00"  # Green for pedestrians
+        portrayal["Layer"] = 4  # Higher layer to ensure visibility
+        return portrayal  # Return immediately to prioritize PersonAgent
+
+    if issubclass(agent_class, BuildingAgent):
+        portrayal["Shape"] = "rect"
+        portrayal["w"] = 0.8
+        portrayal["h"] = 0.8
+        portrayal["Color"] = "#808080"  # Grey for buildings
+        portrayal["Layer"] = 1
+
+    elif issubclass(agent_class, TrafficLightAgent):
+        portrayal["Shape"] = "rect"
+        portrayal["w"] = 0.6
+        portrayal["h"] = 0.6
+        if state == "green":
+            portrayal["Color"] = "green"
+        elif state == "red":
+            portrayal["Color"] = "red"
+        else:
+            portrayal["Color"] = "yellow"
+        portrayal["Layer"] = 2
+
+    elif issubclass(agent_class, CarAgent):
+        portrayal["Shape"] = "circle"
+        portrayal["r"] = 0.5
+        portrayal["Color"] = "#0000FF" if state == "happy" else "#FF0000"
+        portrayal["Layer"] = 3
+
+    elif issubclass(agent_class, WrecklessAgent):
+        portrayal["Shape"] = "circle"
+        portrayal["r"] = 0.5
+        portrayal["Color"] = "#FFFF00"  # Yellow for wreckless agents
+        portrayal["Layer"] = 3
+
+    return portrayal
+
+
+portrayal_cache = {}
+
+
+def intersectionPortrayal(agent):
+    """
+    Cached, read-only portrayal keyed by agent class and state.
+    Returns a MappingProxyType, so it only works with CachedCanvasGrid, which adds the
+    coordinates without modifying it; the stock CanvasGrid assigns x/y into the
+    portrayal and raises TypeError.
+    """
+    if agent is None:
+        return
+    key = (type(agent), getattr(agent, "state", None))
+    portrayal = portrayal_cache.get(key)
+    if portrayal is None:
+        portrayal = portrayal_cache[key] = MappingProxyType(build_portrayal(*key))
+    return portrayal
+
+
+class CachedCanvasGrid(CanvasGrid):
+    """
+    CanvasGrid that reuses everything that does not change between frames.
+    Static agents (buildings) are portrayed once per model into a precomputed layer,
+    and the positioned portrayal of every (portrayal, cell) pair is built only once,
+    so a frame only allocates its layer lists. That cache is only used for interned,
+    read-only portrayals (MappingProxyType, as returned by intersectionPortrayal); a
+    portrayal method returning fresh dicts gets a new positioned copy every frame.
+    """
+
+    def __init__(self, portrayal_method, grid_width, grid_height, canvas_width=500, canvas_height=500,
+                 static_classes=(BuildingAgent,)):
+        super().__init__(portrayal_method, grid_width, grid_height, canvas_width, canvas_height)
+        self.static_classes = static_classes
+        self.static_model = None
+        self.static_layers = {}
+        self.entries = {}
+
+    def entry(self, portrayal, pos):
+        if not isinstance(portrayal, MappingProxyType):
+            return dict(portrayal, x=pos[0], y=pos[1])
+        # Proxies are not hashable; the cached value keeps the portrayal alive so its id
+        # cannot be reused, and the identity check guards against a different proxy
+        key = (id(portrayal), pos)
+        cached = self.entries.get(key)
+        if cached is None or cached[0] is not portrayal:
+            cached = self.entries[key] = (portrayal, dict(portrayal, x=pos[0], y=pos[1]))
+        return cached[1]
+
+    def build_static(self, model):
+        self.static_layers = {}
+        for agent in model.schedule.agents:
+            if isinstance(agent, self.static_classes):
+                portrayal = self.portrayal_method(agent)
+                if portrayal:
+                    self.static_layers.setdefault(portrayal["Layer"], []).append(self.entry(portrayal, agent.pos))
+        self.static_model = model
+
+    def render(self, model):
+        if self.static_model is not model:
+            self.build_static(model)
+
+        grid_state = {layer: list(entries) for layer, entries in self.static_layers.items()}
+        moving = list(getattr(model, "traffic_lights", []))  # Lights are not in the scheduler
+        moving.extend(agent for agent in model.schedule.agents if not isinstance(agent, self.static_classes))
+        for agent in moving:
+            if agent.pos is None:
+                continue
+            portrayal = self.portrayal_method(agent)
+            if portrayal:
+                grid_state.setdefault(portrayal["Layer"], []).append(self.entry(portrayal, agent.pos))
+        return grid_state
@@ -0,0 +1,199 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from agents import BuildingAgent, TrafficLightAgent, CarAgent, WrecklessAgent, PersonAgent
+
+
+# Same look as intersectionPortrayal in portrayal.py: style -> (layer, shape, size, RGB color)
+STYLES = {
+    "building": (1, "rect", 0.8, (128, 128, 128)),
+    "light_green": (2, "rect", 0.6, (0, 128, 0)),
+    "light_red": (2, "rect", 0.6, (255, 0, 0)),
+    "light_yellow": (2, "rect", 0.6, (255, 255, 0)),
+    "car_happy": (3, "circle", 0.5, (0, 0, 255)),
+    "car_angry": (3, "circle", 0.5, (255, 0, 0)),
+    "wreckless": (3, "circle", 0.5, (255, 255, 0)),
+    "person": (4, "circle", 0.4, (0, 255, 0)),
+}
+
+BACKGROUND = (255, 255, 255)
+
+
+def agent_style(agent):
+    """
+    Style key of an agent, following the same checks as intersectionPortrayal.
+    """
+    if isinstance(agent, PersonAgent):
+        return "person"
+    if isinstance(agent, BuildingAgent):
+        return "building"
+    if isinstance(agent, TrafficLightAgent):
+        if agent.state in ("green", "red"):
+            return "light_" + agent.state
+        return "light_yellow"
+    if isinstance(agent, CarAgent):
+        return "car_happy" if agent.state == "happy" else "car_angry"
+    if isinstance(agent, WrecklessAgent):
+        return "wreckless"
+    return None
+
+
+def snapshot(model):
+    """
+    Compact record of the moving part of a model: a list of (pos, style) for every
+    agent except buildings. A list of snapshots is a recorded trajectory.
+    """
+    agents = [(light.pos, agent_style(light)) for light in model.traffic_lights]
+    for agent in model.schedule.agents:
+        style = agent_style(agent)
+        if style is not None and style != "building":
+            agents.append((agent.pos, style))
+    return agents
+
+
+def make_stamp(shape, size, cell_size):
+    """
+    Boolean mask of one cell for a shape, `size` being the width (rect) in cells or the
+    portrayal radius "r" (circle), which the browser canvas draws as r * cell / 2.
+    """
+    center = (np.arange(cell_size) + 0.5) / cell_size - 0.5
+    dy, dx = np.meshgrid(center, center, indexing="ij")
+    half = size / 2
+    if shape == "rect":
+        return (np.abs(dx) <= half) & (np.abs(dy) <= half)
+    return dx * dx + dy * dy <= half * half
+
+
+class FrameRenderer:
+    """
+    Renders the intersection into RGB NumPy arrays without a browser.
+    The building layer is rasterized once and every frame starts from a copy of it;
+    only lights, cars and pedestrians are drawn per frame.
+    """
+
+    def __init__(self, model, cell_size=10):
+        self.width = model.grid.width
+        self.height = model.grid.height
+        self.cell_size = cell_size
+
+        # Palette index 0 means "nothing in this cell"
+        self.style_names = list(STYLES)
+        self.style_index = {name: i + 1 for i, name in enumerate(self.style_names)}
+        self.palette = np.array([BACKGROUND] + [STYLES[name][3] for name in self.style_names], dtype=np.uint8)
+
+        # One group per (layer, shape, size), drawn in layer order
+        self.groups = {}
+        for name, (layer, shape, size, _) in STYLES.items():
+            self.groups.setdefault((layer, shape, size), []).append(name)
+        self.group_keys = sorted(self.groups)
+        self.group_of_style = {name: key for key, names in self.groups.items() for name in names}
+        self.stamps = {
+            key: np.tile(make_stamp(key[1], key[2], cell_size), (self.height, self.width))
+            for key in self.group_keys
+        }
+
+        self.static = np.empty((self.height * cell_size, self.width * cell_size, 3), dtype=np.uint8)
+        self.static[:] = BACKGROUND
+        buildings = [(agent.pos, "building") for agent in model.schedule.agents if isinstance(agent, BuildingAgent)]
+        self.draw(self.static, buildings)
+
+    def draw(self, frame, agents):
+        """
+        Draw (pos, style) pairs onto a frame, one vectorized pass per style group.
+        """
+        cells = {}
+        for pos, style in agents:
+            key = self.group_of_style[style]
+            index = cells.get(key)
+            if index is None:
+                index = cells[key] = np.zeros((self.height, self.width), dtype=np.uint8)
+            x, y = pos
+            index[self.height - 1 - y, x] = self.style_index[style]  # Row 0 is the top of the grid
+
+        for key in self.group_keys:
+            index = cells.get(key)
+            if index is None:
+                continue
+            pixels = np.repeat(np.repeat(index, self.cell_size, axis=0), self.cell_size, axis=1)
+            mask = (pixels > 0) & self.stamps[key]
+            frame[mask] = self.palette[pixels[mask]]
+        return frame
+
+    def render(self, agents):
+        """
+        Render one snapshot (list of (pos, style)) on top of the static layer.
+        """
+        return self.draw(self.static.copy(), agents)
+
+    def render_model(self, model):
+        return self.render(snapshot(model))
+
+
+def png_chunk(kind, data):
+    chunk = kind + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk) & 0xFFFFFFFF)
+
+
+def png_image_data(pixels, level):
+    # Filter type 0 (none) at the start of every row
+    height = pixels.shape[0]
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1)
+    return zlib.compress(rows.tobytes(), level)
+
+
+def png_header(pixels):
+    height, width = pixels.shape[:2]
+    return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+def write_png(path, pixels, level=1):
+    """
+    Write an RGB uint8 array as a PNG file.
+    """
+    with open(path, "wb") as f:
+        f.write(png_header(pixels))
+        f.write(png_chunk(b"IDAT", png_image_data(pixels, level)))
+        f.write(png_chunk(b"IEND", b""))
+
+
+def write_apng(path, frames, fps=5, level=1):
+    """
+    Write a list of same-sized RGB frames as an animated PNG that loops forever.
+    """
+    height, width = frames[0].shape[:2]
+    sequence = 0
+    with open(path, "wb") as f:
+        f.write(png_header(frames[0]))
+        f.write(png_chunk(b"acTL", struct.pack(">II", len(frames), 0)))
+        for i, pixels in enumerate(frames):
+            f.write(png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", sequence, width, height, 0, 0, 1, fps, 0, 0)))
+            sequence += 1
+            data = png_image_data(pixels, level)
+            if i == 0:
+                f.write(png_chunk(b"IDAT", data))
+            else:
+                f.write(png_chunk(b"fdAT", struct.pack(">I", sequence) + data))
+                sequence += 1
+        f.write(png_chunk(b"IEND", b""))
+
+
+def render_run(model, steps, out_dir, cell_size=10, animation=None, fps=5):
+    """
+    Step a model and write one PNG per step to out_dir (frame_00000.png, ...).
+    If `animation` is a file name, the frames are also written there as an animated PNG.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    renderer = FrameRenderer(model, cell_size)
+    frames = []
+    for step in range(steps):
+        model.step()
+        pixels = renderer.render_model(model)
+        write_png(os.path.join(out_dir, f"frame_{step:05d}.png"), pixels)
+        if animation:
+            frames.append(pixels)
+    if animation and frames:
+        write_apng(os.path.join(out_dir, animation), frames, fps)
+    return steps
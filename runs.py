@@ -0,0 +1,145 @@
+import contextlib
+import csv
+import os
+import random
+from multiprocessing import Pool
+
+from models import IntersectionModel
+from demand import DemandProfile, DemandInjector
+
+
+DEFAULT_PARAMS = {
+    "size": 23,
+    "num_lights": 4,
+    "num_cars": 20,
+    "num_pedestrians": 2,
+}
+
+# Config keys that are passed straight to IntersectionModel
+MODEL_KEYS = ("size", "num_lights", "num_cars", "num_pedestrians", "green_time", "yellow_time", "wreckless_share",
+              "green_times", "phase_order", "activation")
+
+
+def model_params(config):
+    """
+    Turn a flat configuration dict into IntersectionModel keyword arguments.
+    cooperative_share / competitive_share set the car type mix, neutral gets the rest.
+    """
+    params = dict(DEFAULT_PARAMS)
+    for key in MODEL_KEYS:
+        if key in config:
+            params[key] = config[key]
+    for key in ("size", "num_lights", "num_cars", "num_pedestrians", "green_time", "yellow_time"):
+        if key in params:
+            params[key] = int(params[key])
+
+    if "cooperative_share" in config or "competitive_share" in config:
+        cooperative = config.get("cooperative_share", 1 / 3)
+        competitive = config.get("competitive_share", 1 / 3)
+        params["type_weights"] = (cooperative, competitive, max(0.0, 1 - cooperative - competitive))
+    return params
+
+
+def build_model(config, seed=0):
+    """
+    Seed the global random module and build the model of a configuration.
+    An `arrival_rate` (cars per tick per entry lane) adds a constant DemandInjector
+    on top of the initial cars.
+    """
+    random.seed(seed)
+    params = model_params(config)
+    if config.get("arrival_rate"):
+        params["demand"] = DemandInjector(
+            DemandProfile.constant(config["arrival_rate"]),
+            wreckless_share=params.get("wreckless_share", 0.1),
+            type_weights=params.get("type_weights"),
+            seed=seed
+        )
+    return IntersectionModel(**params)
+
+
+def run_configuration(config, steps=500, seed=0):
+    """
+    Run one headless simulation and return the configuration with its measured results.
+    The model's console output is discarded.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        model = build_model(config, seed)
+        for _ in range(steps):
+            model.step()
+
+    travel_time = model.trip_stats.combined("travel_time")
+    delay = model.trip_stats.combined("delay")
+    if travel_time.count:
+        mean_travel_time = travel_time.mean()
+        p95_travel_time = travel_time.quantile(0.95)
+        mean_delay = delay.mean()
+        p95_delay = delay.quantile(0.95)
+    else:
+        # No car finished a trip, every car spent the whole run waiting
+        mean_travel_time = p95_travel_time = mean_delay = p95_delay = steps
+
+    result = dict(config)
+    result.update({
+        "seed": seed,
+        "steps": steps,
+        "throughput": model.completedCars / steps,
+        "mean_travel_time": mean_travel_time,
+        "p95_travel_time": p95_travel_time,
+        "mean_delay": mean_delay,
+        "p95_delay": p95_delay,
+    })
+    return result
+
+
+def run_ensemble(configs, seeds=(0,), steps=500, processes=None):
+    """
+    Run every configuration with every seed, in parallel worker processes.
+    """
+    jobs = [(config, steps, seed) for config in configs for seed in seeds]
+    if processes == 1:
+        return [run_configuration(*job) for job in jobs]
+    with Pool(processes) as pool:
+        return pool.starmap(run_configuration, jobs)
+
+
+def save_results(path, rows):
+    """
+    Append result rows to a CSV file, writing the header if the file is new.
+    """
+    if not rows:
+        return
+    fieldnames = list(rows[0])
+    for row in rows[1:]:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    if not is_new:
+        with open(path, newline="") as f:
+            header = next(csv.reader(f), [])
+        fieldnames = header + [key for key in fieldnames if key not in header]
+        if fieldnames != header:
+            raise ValueError(f"Results in {path} do not have the columns {fieldnames}")
+
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if is_new:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_results(path):
+    """
+    Read result rows from a CSV file, converting numeric values to float.
+    """
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            parsed = {}
+            for key, value in row.items():
+                try:
+                    parsed[key] = float(value)
+                except (TypeError, ValueError):
+                    parsed[key] = value
+            rows.append(parsed)
+    return rows
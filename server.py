@@ -0,0 +1,190 @@
+import queue
+import threading
+import time
+
+import tornado.escape
+from mesa.visualization.ModularVisualization import ModularServer, SocketHandler, VisualizationElement
+
+
+class BackgroundRunControl(VisualizationElement):
+    """
+    Makes the Start/Stop button send explicit "play"/"pause" messages, so the server
+    knows when to run its worker. The stock page only sends get_step, which cannot
+    tell a Start from a single Step.
+    """
+
+    js_code = """
+    (function () {
+      const start = controller.start.bind(controller);
+      const stop = controller.stop.bind(controller);
+      controller.start = function () { send({ type: "play" }); start(); };
+      controller.stop = function () { send({ type: "pause" }); stop(); };
+    })();
+    elements.push({ render: function () {}, reset: function () {} });
+    """
+
+    def render(self, model):
+        return None
+
+
+class BackgroundSocketHandler(SocketHandler):
+    """
+    Websocket handler for BackgroundModularServer.
+    While any viewer is playing, clients just get the latest frame published by the
+    background worker, so slow clients or many viewers do not slow down the simulation.
+    When no viewer is playing, get_step (the Step button) advances the model by one step.
+    """
+
+    def on_message(self, message):
+        msg = tornado.escape.json_decode(message)
+
+        if msg["type"] == "get_step":
+            if not self.application.model.running:
+                self.write_message({"type": "end"})
+            elif self.application.playing:
+                frame = self.application.latest_frame()
+                if frame is not None:
+                    self.write_message({"type": "viz_state", "data": frame})
+            else:
+                self.write_message({"type": "viz_state", "data": self.application.step_once()})
+        elif msg["type"] == "play":
+            self.application.play(self)
+        elif msg["type"] == "pause":
+            self.application.pause(self)
+        elif msg["type"] == "reset":
+            self.application.reset_model()
+            self.write_message({"type": "viz_state", "data": self.application.latest_frame()})
+        else:
+            super().on_message(message)
+
+    def on_close(self):
+        self.application.pause(self)  # A closed viewer no longer keeps the worker running
+
+
+class BackgroundModularServer(ModularServer):
+    """
+    ModularServer that steps the model in a background thread at a target rate.
+    Rendered frames go into a bounded queue (oldest frames are dropped when it is full)
+    and websocket clients read the most recent one.
+    The worker runs while at least one viewer is between Start and Stop (see
+    BackgroundRunControl); otherwise the model is stepped on request, one step at a time.
+    """
+
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params=None,
+                 port=None, steps_per_second=10, frame_queue_size=4):
+        self.steps_per_second = steps_per_second
+        self.frames = queue.Queue(maxsize=frame_queue_size)
+        self.current_frame = None
+        self.model_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.worker = None
+        self.players = set()  # Connections whose UI is running
+
+        visualization_elements = list(visualization_elements) + [BackgroundRunControl()]
+        super().__init__(model_cls, visualization_elements, name, model_params, port)
+
+        # ModularServer registers the default SocketHandler for /ws, swap in ours
+        for rule in self.wildcard_router.rules:
+            if rule.target is SocketHandler:
+                rule.target = BackgroundSocketHandler
+
+    def reset_model(self):
+        """
+        Stop the worker, rebuild the model and resume stepping it if a viewer is playing.
+        """
+        self.stop_worker()
+        with self.model_lock:
+            super().reset_model()
+            self.clear_frames()
+            self.current_frame = self.render_model()
+        if self.playing:
+            self.start_worker()
+
+    @property
+    def playing(self):
+        return bool(self.players)
+
+    def play(self, connection):
+        self.players.add(connection)
+        if self.worker is None:
+            self.start_worker()
+
+    def pause(self, connection):
+        self.players.discard(connection)
+        if not self.players:
+            self.stop_worker()
+
+    def step_once(self):
+        """
+        Advance the model by one step in the calling thread and return its frame.
+        """
+        with self.model_lock:
+            self.model.step()
+            frame = self.render_model()
+        self.clear_frames()
+        self.current_frame = frame
+        return frame
+
+    def start_worker(self):
+        self.stop_event.clear()
+        self.worker = threading.Thread(target=self.run_worker, daemon=True)
+        self.worker.start()
+
+    def stop_worker(self):
+        if self.worker is not None:
+            self.stop_event.set()
+            self.worker.join()
+            self.worker = None
+
+    def run_worker(self):
+        """
+        Step the model at `steps_per_second` and publish a frame after every step.
+        """
+        interval = 1.0 / self.steps_per_second if self.steps_per_second else 0
+        next_tick = time.monotonic()
+        while not self.stop_event.is_set():
+            with self.model_lock:
+                if not self.model.running:
+                    break
+                self.model.step()
+                frame = self.render_model()
+            self.publish_frame(frame)
+
+            if interval:
+                next_tick += interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                else:
+                    next_tick = time.monotonic()  # Running behind, don't try to catch up
+
+    def publish_frame(self, frame):
+        """
+        Put a frame in the queue, dropping the oldest one if the queue is full.
+        """
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def clear_frames(self):
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def latest_frame(self):
+        """
+        Drain the queue and return the most recent frame (or the last one seen if nothing new arrived).
+        """
+        while True:
+            try:
+                self.current_frame = self.frames.get_nowait()
+            except queue.Empty:
+                return self.current_frame
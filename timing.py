@@ -0,0 +1,57 @@
+class TimingWheel:
+    """
+    Hashed timing wheel for scheduling events a number of ticks in the future.
+    Each call to advance() moves the wheel one tick and returns only the events
+    that are due, so the per-tick cost depends on how many events fire, not on
+    how many are pending.
+    """
+
+    def __init__(self, size=32):
+        self.size = size
+        self.slots = [[] for _ in range(size)]
+        self.current_tick = 0
+        self.pending = 0
+
+    def schedule(self, delay, event):
+        """
+        Schedule an event to fire `delay` ticks from now (delay >= 1).
+        Delays longer than the wheel wrap around and are kept until their tick comes.
+        """
+        if delay < 1:
+            delay = 1
+        due_tick = self.current_tick + delay
+        self.slots[due_tick % self.size].append((due_tick, event))
+        self.pending += 1
+        return due_tick
+
+    def advance(self):
+        """
+        Move the wheel one tick forward and return the list of events due at that tick.
+        """
+        self.current_tick += 1
+        slot_index = self.current_tick % self.size
+        slot = self.slots[slot_index]
+        if not slot:
+            return []
+
+        due = []
+        remaining = []
+        for due_tick, event in slot:
+            if due_tick == self.current_tick:
+                due.append(event)
+            else:
+                remaining.append((due_tick, event))  # Later lap of the wheel
+
+        self.slots[slot_index] = remaining
+        self.pending -= len(due)
+        return due
+
+    def clear(self):
+        """
+        Drop every pending event.
+        """
+        self.slots = [[] for _ in range(self.size)]
+        self.pending = 0
+
+    def __len__(self):
+        return self.pending